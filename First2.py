@@ -1,187 +1,49 @@
-NONTERMS = [
-    "<program>",
-    "<statement>",
-    "<declaration>",
-    "<var_declaration>",
-    "<const_declaration>",
-    "<function_declare>",
-    "<identifier>",
-    "<begin>",
-    "<letter>",
-    "<name>",
-    "<digit>",
-    "<expression>",
-    "<expression_tail>",  # New non-terminal for handling right recursion
-    "<primary_expression>",  # New non-terminal for primary expressions
-    "<operator>",
-    "<singleOp>",
-    "<logicOp>",
-    "<number>",
-    "<string>",
-    "<text>",
-    "<block>",
-    "<call>",
-    "<return>",
-    "<print>",
-    "<if-condition>",
-    "<condition>",
-    "<condition_tail>",  # New non-terminal for handling logical operations in conditions
-    "<primary_condition>",  # New non-terminal for the core condition expression
-    "<compOp>",
-    "<loop>",
-    "<keyword>",
-    "<LBracket>",
-    "<RBracket>",
-    "<datatype>"
-]
-
-
-TERMS = [
-    "(", ")", "*", "+", "-", "/", "0", "1", "2", "3", "4", "5", "6", "7", "8", "9", 
-    ";", "<", "<=", "==", ">", ">=", "!=", "=", "A-Z", "a-z", "call", "do", 
-    "else", "for", "if", "elif", "print", "return", "_", "{", "}", 
-    "and", "or", "not", "\"", ">", "<", "<=", ">=", "<>", "int", "float", "string","++","--"
-]
-
-
-epsilon = "epsilon"
-FIRST = {}
-
-grammar = {
-    "<program>": ["<statement>*"],  # A program consists of zero or more statements.
-    
-    "<statement>": [
-        "<declaration>",
-        "<call>",
-        "<return>",
-        "<print>",
-        "<if-condition>",
-        "<loop>",
-        "<expression>"
-    ],
-
-    "<declaration>": ["<var_declaration>", "<const_declaration>", "<function_declare>"],
-
-    "<var_declaration>": ["<datatype> <identifier> = <expression> ;"],
-    "<const_declaration>": ["<datatype> <identifier> = <number> ;"],
-
-    "<identifier>": ["<begin> <name>*"],
-
-    "<begin>": ["_", "<letter>"],
-
-    "<name>": ["<letter>", "<digit>"],
-    "<digit>": ["0", "1", "2", "3", "4", "5", "6", "7", "8", "9"],
-    "<letter>": ["a-z", "A-Z"],
-
-    "<expression>": [
-        "<primary_expression> <expression_tail>"
-    ],
-
-    "<expression_tail>": [
-        "<operator> <primary_expression> <expression_tail>",  # recursive part
-        "epsilon"  # epsilon (empty production)
-    ],
-
-    "<primary_expression>": [
-        "<identifier>",
-        "<number>",
-        "<string>"
-    ],
-
-    "<operator>": ["+", "-", "*", "/"],
-    "<singleOp>": ["++", "--"],
-
-    "<logicOp>": ["and", "or", "not"],
-
-    "<number>": ["<digit>", "digit. digit"],  # Support for integers and floats
-    "<string>": ['" <text> "'],  # String representation
-    "<text>": ['"<letter>+"'],  # Sequence of letters
-
-    "<function_declare>": ["do <identifier> ((<datatype><identifier><separator>)*) <block>"],
-
-    "<block>": ["{ <statement>* }"],
-
-    "<call>": ["call <identifier> (<identifier>*) ;"],
-    "<return>": ["return <expression> ;"],
-    "<print>": ["print ( <expression> ) ;","print ( <call> );"],
-
-    "<if-condition>": [
-        "if <condition> <block>",
-        "if <condition> <block> elif <condition> <block>",
-        "if <condition> <block> else <block>"
-    ],
-
-    "<condition>": [
-        "<primary_condition> <condition_tail>"
-    ],
-
-    "<condition_tail>": [
-        "<logicOp> <primary_condition> <condition_tail>",  # recursive part for logical operations
-        "<compOp> <primary_condition>",  # comparison part (non-recursive)
-        "epsilon"  # epsilon (empty production)
-    ],
-
-    "<primary_condition>": [
-        "<expression>"
-    ],
-
-    "<compOp>": [">", "<", "==", "<>", ">=", "<="],  # Comparison operators
-
-    "<loop>": [
-        "for (<var_declaration>; <condition>; <expression>) <block>"
-    ],
-
-    "<keyword>": ["do", "call", "return", "if", "elif", "else", "for", "break", "skip", "print"],
-
-    "<LBracket>": ["("],
-    "<RBracket>": [")", "}"],
-
-    "<datatype>": ["int", "float", "string"],  # Added data types
-}
-
-
-
-def computeFirst(g):
-    # Initialize FIRST sets
-    for terminal in TERMS:
-        FIRST[terminal] = {terminal}
-
-    for non_terminal in NONTERMS:
-        FIRST[non_terminal] = set()
-
-    # Compute FIRST sets iteratively
-    for _ in range(len(NONTERMS)):  # Repeat until convergence
-        for non_terminal in g:
-            for production in g[non_terminal]:
-                # Compute FIRST for the production
-                symbols = production.split()  # Split production into symbols
-                first_of_production = computeFirstOfList(symbols)
-                FIRST[non_terminal].update(first_of_production)
+# First2.py
+# FIRST sets of the reference grammar, grammar.bnf. They are read from its
+# compiled artifact (see grammarc.py) the first time First2.FIRST is used.
+import grammarc
+from analysis import EPSILON
+
+epsilon = EPSILON
+_FIRST = None  # FIRST sets, see get_first
+
+
+def computeFirst(compiled):
+    """FIRST of every symbol of a grammarc.CompiledGrammar.
+
+    A terminal t has {t}; nonterminals that can be empty have epsilon too.
+    """
+    first = {terminal: {terminal} for terminal in compiled.terminals[2:]}
+    first.update(compiled.first_sets())
+    return first
+
+def get_first():
+    """FIRST sets of grammar.bnf, computed on first use rather than at import."""
+    global _FIRST
+    if _FIRST is None:
+        _FIRST = computeFirst(grammarc.load(grammarc.REFERENCE))
+    return _FIRST
+
+def __getattr__(name):
+    # First2.FIRST reads get_first()
+    if name == "FIRST":
+        return get_first()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 def computeFirstOfList(symbols):
+    FIRST = get_first()
     result = set()
     for symbol in symbols:
-        if symbol in TERMS:  # Terminal
-            result.add(symbol)
+        if symbol not in FIRST:  # Not in the grammar
+            continue
+        result.update(FIRST[symbol] - {epsilon})
+        if epsilon not in FIRST[symbol]:
             break
-        elif symbol in NONTERMS:  # Non-terminal
-            result.update(FIRST[symbol] - {epsilon})
-            if epsilon not in FIRST[symbol]:
-                break
     else:
         result.add(epsilon)  # Add epsilon if all symbols can derive epsilon
     return result
 
-# Compute FIRST sets for the grammar
-computeFirst(grammar)
-
 # Print the FIRST sets in a clear format
 # print("FIRST Sets:")
-# for non_terminal in NONTERMS:
+# for non_terminal in grammarc.load().nonterminals:
 #     print(f"FIRST({non_terminal}) = {{ {', '.join(FIRST[non_terminal])} }}")
-
-"""do sum (x,y){
-    return x + y
-    }
-    s = call sum(3, 4)
-    print(s)"""
\ No newline at end of file
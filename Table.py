@@ -48,35 +48,80 @@ def read_code_from_file(filename):
         print(f"File {filename} not found.")
         return None
 
+# Patterns parse_code matches at the start of each line
+DECLARATION = re.compile(r"(int|float|string)\s+([a-zA-Z0-9_]+)\s*=\s*(.*);")
+FUNCTION = re.compile(r"do\s+([a-zA-Z0-9_]+)\s*\((.*)\)\s*{")
+CALL = re.compile(r"call\s+([a-zA-Z0-9_]+)\s*\((.*)\)\s*;")
+WORD = re.compile(r"\b([a-zA-Z0-9_]+)\b")
+NOT_REFERENCES = ['int', 'float', 'string', 'do', 'return', 'if', 'else', 'for', 'call', 'print']
+
+def parse_line(symbol_table, line, line_num):
+    var_decl_match = DECLARATION.match(line)
+    if var_decl_match:
+        data_type = var_decl_match.group(1)
+        var_name = var_decl_match.group(2)
+        symbol_table.add_variable(var_name, data_type, line_num)
+
+    func_decl_match = FUNCTION.match(line)
+    if func_decl_match:
+        func_name = func_decl_match.group(1)
+        params = func_decl_match.group(2).split(',')
+        num_args = len(params) if params != [''] else 0
+        symbol_table.add_variable(func_name, 'void', line_num, is_function=True, num_args=num_args)
+
+    func_call_match = CALL.match(line)
+    if func_call_match:
+        func_name = func_call_match.group(1)
+        symbol_table.update_reference(func_name, line_num)
+
 def parse_code(code):
     symbol_table = SymbolTable()
     lines = code.splitlines()
     for line_num, line in enumerate(lines, start=1):
-        var_decl_match = re.match(r"(int|float|string)\s+([a-zA-Z0-9_]+)\s*=\s*(.*);", line)
-        if var_decl_match:
-            data_type = var_decl_match.group(1)
-            var_name = var_decl_match.group(2)
-            symbol_table.add_variable(var_name, data_type, line_num)
-
-        func_decl_match = re.match(r"do\s+([a-zA-Z0-9_]+)\s*\((.*)\)\s*{", line)
-        if func_decl_match:
-            func_name = func_decl_match.group(1)
-            params = func_decl_match.group(2).split(',')
-            num_args = len(params) if params != [''] else 0
-            symbol_table.add_variable(func_name, 'void', line_num, is_function=True, num_args=num_args)
-
-        func_call_match = re.match(r"call\s+([a-zA-Z0-9_]+)\s*\((.*)\)\s*;", line)
-        if func_call_match:
-            func_name = func_call_match.group(1)
-            symbol_table.update_reference(func_name, line_num)
-
-        var_ref_match = re.findall(r"\b([a-zA-Z0-9_]+)\b", line)
+        parse_line(symbol_table, line, line_num)
+
+        var_ref_match = WORD.findall(line)
         for var_name in var_ref_match:
-            if var_name not in ['int', 'float', 'string', 'do', 'return', 'if', 'else', 'for', 'call', 'print']:
+            if var_name not in NOT_REFERENCES:
                 symbol_table.update_reference(var_name, line_num)
 
     return symbol_table
 
+# Lines parse_line can match, and line breaks splitlines knows besides '\n'
+LINE_START = re.compile(r"^(?=int|float|string|do|call)", re.MULTILINE)
+OTHER_BREAKS = re.compile("[\x0b\x0c\x1c\x1d\x1e\x85\u2028\u2029]|\r(?!\n)")
+
+# Same table as parse_code, from the text of a tokenstream.TokenStream in one
+# pass instead of line by line: only lines starting with a datatype, do or
+# call go through parse_line, and names are looked up only if declared. The
+# tokens alone are not enough, since parse_code also counts words inside
+# strings and comments, and a declaration needs its ';' on the same line.
+def parse_tokens(stream):
+    from basic import LineIndex
+    text = stream.text
+    if OTHER_BREAKS.search(text):
+        return parse_code(text)
+    symbol_table = SymbolTable()
+    references = symbol_table.references
+    lines = LineIndex(text)
+    starts = [match.start() for match in LINE_START.finditer(text)]
+    next_line = 0
+
+    for match in WORD.finditer(text):
+        position = match.start()
+        # Declarations come before the references on their own line
+        while next_line < len(starts) and starts[next_line] <= position:
+            start = starts[next_line]
+            end = text.find('\n', start)
+            line = text[start:end] if end >= 0 else text[start:]
+            parse_line(symbol_table, line.rstrip('\r'), lines.line_col(start)[0] + 1)
+            next_line += 1
+        var_name = match.group(1)
+        if var_name in references and var_name not in NOT_REFERENCES:
+            symbol_table.update_reference(var_name, lines.line_col(position)[0] + 1)
+
+    return symbol_table
+
 def calculate_hash(variable_name, hash_max):
     variable_length = len(variable_name)
     ascii_sum = sum(ord(char) for char in variable_name[0])
@@ -0,0 +1,399 @@
+# analysis.py
+# Nullable, FIRST and FOLLOW of a context-free grammar, in time close to
+# linear in the size of the grammar.
+#
+# Nullable symbols come from a worklist: every production keeps a count of
+# the symbols in it not yet known to be nullable, and each nonterminal found
+# nullable decrements the productions that use it. FIRST and FOLLOW are then
+# each a set of equations value[n] = local[n] | value[m] for the m that n
+# depends on. These are solved one strongly connected component at a time,
+# dependencies first, so every edge is followed once instead of sweeping the
+# whole grammar until nothing changes. Left recursion is just a cycle in the
+# graph and needs no special case.
+#
+# Productions are sequences of symbols, an empty one for epsilon. Symbols
+# that are not nonterminals are terminals. Every terminal gets a bit, so the
+# sets are ints while they are computed: union, difference and comparison
+# are one operation each instead of a walk over a set of strings. The
+# converters give them back as sets of strings.
+#
+# load_analysis keeps the tables in a JSON file named by a hash of the
+# grammar (and of this file), so a grammar that has not changed is read
+# back instead of analysed again on every start.
+import hashlib
+import json
+import os
+import tempfile
+
+EPSILON = "epsilon"   # First2.epsilon, marks FIRST sets that can be empty
+EPSILON_BIT = 1       # bit of EPSILON in every GrammarAnalysis.bits
+END = "$"
+
+def components(nodes, successors):
+    """Strongly connected components of a graph, as lists of nodes.
+
+    Tarjan's algorithm without recursion. A component comes after every
+    component it has edges into.
+    """
+    index = {}
+    low = {}
+    stack = []
+    on_stack = set()
+    result = []
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors.get(root, ())))]
+        while work:
+            node, edges = work[-1]
+            for successor in edges:
+                if successor not in index:
+                    index[successor] = low[successor] = len(index)
+                    stack.append(successor)
+                    on_stack.add(successor)
+                    work.append((successor, iter(successors.get(successor, ()))))
+                    break
+                if successor in on_stack and index[successor] < low[node]:
+                    low[node] = index[successor]
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    if low[node] < low[parent]:
+                        low[parent] = low[node]
+                if low[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    result.append(component)
+    return result
+
+def propagate(nodes, local, successors):
+    """Least solution of value[n] = local[n] | value[m] for m in successors[n].
+
+    Values are terminal bitmasks. Every node of a strongly connected
+    component ends with the same one.
+    """
+    values = {}
+    for component in components(nodes, successors):
+        result = 0
+        for node in component:
+            result |= local.get(node, 0)
+            for successor in successors.get(node, ()):
+                result |= values.get(successor, 0)  # 0 inside this component
+        for node in component:
+            values[node] = result
+    return values
+
+class TerminalBits:
+    """Bit number of every terminal, so that a set of terminals is an int."""
+    def __init__(self, terminals=()):
+        self.terminals = []
+        self.numbers = {}
+        for terminal in terminals:
+            self.bit(terminal)
+
+    def bit(self, terminal):
+        """Mask of one terminal, numbering it if it is new."""
+        number = self.numbers.get(terminal)
+        if number is None:
+            number = self.numbers[terminal] = len(self.terminals)
+            self.terminals.append(terminal)
+        return 1 << number
+
+    def mask(self, terminals):
+        result = 0
+        for terminal in terminals:
+            result |= self.bit(terminal)
+        return result
+
+    def decode(self, mask):
+        """Set of the terminals in mask."""
+        terminals = self.terminals
+        result = set()
+        while mask:
+            low = mask & -mask
+            result.add(terminals[low.bit_length() - 1])
+            mask ^= low
+        return result
+
+class GrammarAnalysis:
+    """Nullable, FIRST and FOLLOW of productions, each computed on first use.
+
+    productions maps a nonterminal to its symbol sequences. nonterminals
+    names more nonterminals, ones without productions derive nothing. seeds
+    maps nonterminals to terminals their FOLLOW holds whatever the grammar
+    says; the start symbol is followed by end.
+
+    The *_bits members are masks of self.bits, in which EPSILON is bit 0
+    and end, given a start symbol, bit 1;
+    first, follow, first_of and the *_sets converters give sets of strings.
+    """
+    def __init__(self, productions, start=None, nonterminals=None, seeds=None, end=END):
+        self.productions = productions
+        self.start = start
+        self.nonterminals = set(productions)
+        if nonterminals is not None:
+            self.nonterminals.update(nonterminals)
+        self.seeds = seeds
+        self.end = end
+        self.bits = TerminalBits([EPSILON] if start is None else [EPSILON, end])
+        for productions in self.productions.values():
+            for production in productions:
+                for symbol in production:
+                    if symbol not in self.nonterminals:
+                        self.bits.bit(symbol)
+        self._nullable = None
+        self._first_bits = None
+        self._follow_bits = None
+        self._first = None
+        self._follow = None
+        self._first_of_bits = {}
+        self._first_of = {}
+
+    @property
+    def nullable(self):
+        """Set of nonterminals that derive the empty sequence."""
+        if self._nullable is None:
+            nonterminals = self.nonterminals
+            heads = []
+            remaining = []
+            users = {}
+            worklist = []
+            for nonterminal, productions in self.productions.items():
+                for production in productions:
+                    if any(symbol not in nonterminals for symbol in production):
+                        continue  # a terminal, never empty
+                    number = len(heads)
+                    heads.append(nonterminal)
+                    remaining.append(len(production))
+                    for symbol in production:
+                        users.setdefault(symbol, []).append(number)
+                    if not production:
+                        worklist.append(nonterminal)
+            nullable = set()
+            while worklist:
+                nonterminal = worklist.pop()
+                if nonterminal in nullable:
+                    continue
+                nullable.add(nonterminal)
+                for number in users.get(nonterminal, ()):
+                    remaining[number] -= 1
+                    if not remaining[number]:
+                        worklist.append(heads[number])
+            self._nullable = nullable
+        return self._nullable
+
+    @property
+    def first_bits(self):
+        """Nonterminal -> mask of the terminals its strings can start with, no EPSILON."""
+        if self._first_bits is None:
+            nonterminals, nullable, bit = self.nonterminals, self.nullable, self.bits.bit
+            local = {}
+            successors = {}
+            for nonterminal, productions in self.productions.items():
+                for production in productions:
+                    for symbol in production:
+                        if symbol not in nonterminals:
+                            local[nonterminal] = local.get(nonterminal, 0) | bit(symbol)
+                            break
+                        successors.setdefault(nonterminal, set()).add(symbol)
+                        if symbol not in nullable:
+                            break
+            self._first_bits = propagate(nonterminals, local, successors)
+        return self._first_bits
+
+    @property
+    def follow_bits(self):
+        """Nonterminal -> mask of the terminals that can come right after it."""
+        if self._follow_bits is None:
+            nonterminals, nullable, first = self.nonterminals, self.nullable, self.first_bits
+            bits = self.bits
+            local = {nonterminal: bits.mask(terminals) for nonterminal, terminals in (self.seeds or {}).items()}
+            if self.start is not None:
+                local[self.start] = local.get(self.start, 0) | bits.bit(self.end)
+            # successors[symbol] holds the nonterminals whose FOLLOW flows into symbol's
+            successors = {}
+            for nonterminal, productions in self.productions.items():
+                for production in productions:
+                    trailer = 0  # FIRST of the rest of the production
+                    rest_nullable = True
+                    for symbol in reversed(production):
+                        if symbol not in nonterminals:
+                            trailer = bits.bit(symbol)
+                            rest_nullable = False
+                            continue
+                        if trailer:
+                            local[symbol] = local.get(symbol, 0) | trailer
+                        if rest_nullable and symbol != nonterminal:
+                            successors.setdefault(symbol, set()).add(nonterminal)
+                        if symbol in nullable:
+                            trailer |= first[symbol]
+                        else:
+                            trailer = first[symbol]
+                            rest_nullable = False
+            self._follow_bits = propagate(nonterminals, local, successors)
+        return self._follow_bits
+
+    @property
+    def first(self):
+        """Nonterminal -> frozenset of first_bits."""
+        if self._first is None:
+            self._first = self.frozensets(self.first_bits)
+        return self._first
+
+    @property
+    def follow(self):
+        """Nonterminal -> frozenset of follow_bits."""
+        if self._follow is None:
+            self._follow = self.frozensets(self.follow_bits)
+        return self._follow
+
+    def first_of_bits(self, symbols):
+        """FIRST mask of a symbol sequence, with EPSILON if all of it can be empty."""
+        key = tuple(symbols)
+        result = self._first_of_bits.get(key)
+        if result is None:
+            nonterminals, nullable, first = self.nonterminals, self.nullable, self.first_bits
+            result = 0
+            for symbol in key:
+                if symbol not in nonterminals:
+                    result |= self.bits.bit(symbol)
+                    break
+                result |= first[symbol]
+                if symbol not in nullable:
+                    break
+            else:
+                result |= EPSILON_BIT
+            self._first_of_bits[key] = result
+        return result
+
+    def first_of(self, symbols):
+        """FIRST of a symbol sequence as a frozenset, with EPSILON if all of it can be empty."""
+        key = tuple(symbols)
+        result = self._first_of.get(key)
+        if result is None:
+            result = self._first_of[key] = frozenset(self.bits.decode(self.first_of_bits(key)))
+        return result
+
+    def predict_bits(self, nonterminal, production):
+        """Mask of the lookaheads that pick production for nonterminal."""
+        first = self.first_of_bits(production)
+        if first & EPSILON_BIT:
+            return (first ^ EPSILON_BIT) | self.follow_bits.get(nonterminal, 0)
+        return first
+
+    def key(self):
+        """Hex digest naming the grammar, the start symbol, seeds, end and this version of the code."""
+        digest = hashlib.sha256()
+        digest.update(json.dumps([
+            analysis_version(),
+            {nonterminal: [list(production) for production in productions]
+             for nonterminal, productions in self.productions.items()},
+            sorted(self.nonterminals),
+            self.start,
+            {nonterminal: sorted(terminals) for nonterminal, terminals in (self.seeds or {}).items()},
+            self.end,
+        ], sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def tables(self):
+        """Every table, computed if need be, in a JSON-ready dict."""
+        return {
+            "key": self.key(),
+            "nullable": sorted(self.nullable),
+            "first": {nonterminal: f"{mask:x}" for nonterminal, mask in self.first_bits.items()},
+            "follow": {nonterminal: f"{mask:x}" for nonterminal, mask in self.follow_bits.items()},
+            "terminals": self.bits.terminals,  # last, computing the others numbers new terminals
+        }
+
+    def restore(self, tables):
+        """Takes the tables from a tables() dict instead of computing them."""
+        self.bits = TerminalBits(tables["terminals"])
+        self._nullable = set(tables["nullable"])
+        self._first_bits = {nonterminal: int(mask, 16) for nonterminal, mask in tables["first"].items()}
+        self._follow_bits = {nonterminal: int(mask, 16) for nonterminal, mask in tables["follow"].items()}
+        self._first = self._follow = None
+        self._first_of_bits = {}
+        self._first_of = {}
+
+    def frozensets(self, masks):
+        decode = self.bits.decode
+        return {nonterminal: frozenset(decode(mask)) for nonterminal, mask in masks.items()}
+
+    def first_sets(self):
+        """FIRST of every nonterminal as a new set, with EPSILON if it is nullable."""
+        decode, nullable = self.bits.decode, self.nullable
+        return {nonterminal: decode(mask | (EPSILON_BIT if nonterminal in nullable else 0))
+                for nonterminal, mask in self.first_bits.items()}
+
+    def follow_sets(self):
+        """FOLLOW of every nonterminal as a new set."""
+        decode = self.bits.decode
+        return {nonterminal: decode(mask) for nonterminal, mask in self.follow_bits.items()}
+
+_version = None
+
+def analysis_version():
+    global _version
+    if _version is None:
+        with open(os.path.abspath(__file__), 'rb') as file:
+            _version = hashlib.sha256(file.read()).hexdigest()[:16]
+    return _version
+
+def default_directory():
+    """grammar/ in the parse cache directory, None if PARSE_CACHE=0 turns the cache off."""
+    if os.environ.get("PARSE_CACHE") == "0":
+        return None
+    import cache
+    return os.path.join(cache.default_directory(), "grammar")
+
+def load_analysis(productions, start=None, nonterminals=None, seeds=None, end=END, directory=None):
+    """GrammarAnalysis with its tables read from directory, or computed and saved there.
+
+    directory defaults to default_directory(). A missing, damaged or
+    unwritable file only means the tables are computed.
+    """
+    analysis = GrammarAnalysis(productions, start, nonterminals, seeds, end)
+    if directory is None:
+        directory = default_directory()
+        if directory is None:
+            return analysis
+    key = analysis.key()
+    path = os.path.join(directory, key + ".json")
+    try:
+        with open(path, 'r') as file:
+            tables = json.load(file)
+        if tables["key"] == key:
+            analysis.restore(tables)
+            try:
+                os.utime(path)  # for cache.DiskCache.prune, which sees these files too
+            except OSError:
+                pass
+            return analysis
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    data = json.dumps(analysis.tables())
+    try:
+        os.makedirs(directory, exist_ok=True)
+        handle, temp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, 'w') as file:
+                file.write(data)
+            os.replace(temp, path)
+        except BaseException:
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+            raise
+    except OSError:
+        pass
+    return analysis
@@ -0,0 +1,316 @@
+# benchmark.py
+# Synthetic corpus generator and lexer/parser benchmarks.
+#
+#   python benchmark.py                      1KB .. 100MB, every stage
+#   python benchmark.py --sizes 1KB,1MB --stages fast,compact
+#   python benchmark.py --json results.json
+#
+# Every stage runs on the same seeded program for each size and reports
+# tokens/sec, statements/sec and peak memory, then the scaling exponent
+# between neighbouring sizes (1.0 means time grows linearly with size).
+# A stage that takes longer than --max-seconds is not run on larger sizes.
+import argparse
+import io
+import json
+import math
+import random
+import time
+import tracemalloc
+
+import parallel
+import parsing
+import pipeline
+import predictive
+import runner
+import Table
+from tokenstream import stream_lexer
+
+SIZES = ["1KB", "10KB", "100KB", "1MB", "10MB", "100MB"]
+UNITS = {"KB": 1 << 10, "MB": 1 << 20, "GB": 1 << 30}
+
+def parse_size(size):
+    size = size.strip().upper()
+    for unit, factor in UNITS.items():
+        if size.endswith(unit):
+            return int(float(size[:-len(unit)]) * factor)
+    return int(size)
+
+# Program generator
+# Programs only use constructs that basic.lexer and parsing.Parser both
+# accept: operators are spaced out and no line ends in a bare identifier,
+# since the lexer reads a newline as part of a word.
+class ProgramGenerator:
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+        self.numbers = []      # declared int/float variables
+        self.functions = []    # (name, number of parameters)
+        self.names = 0
+        self.statements = 0
+
+    def new_name(self, prefix):
+        self.names += 1
+        return f"{prefix}{self.names}"
+
+    def number(self):
+        if self.random.random() < 0.3:
+            return f"{self.random.randint(0, 999)}.{self.random.randint(0, 99)}"
+        return str(self.random.randint(0, 9999))
+
+    def primary(self, names):
+        if names and self.random.random() < 0.6:
+            return self.random.choice(names)
+        return self.number()
+
+    def expression(self, names):
+        parts = [self.primary(names)]
+        for _ in range(self.random.randint(0, 3)):
+            parts.append(self.random.choice("+-*/"))
+            parts.append(self.primary(names))
+        return " ".join(parts)
+
+    def condition(self, names):
+        return f"{self.expression(names)} {self.random.choice('<>')} {self.expression(names)}"
+
+    def comment(self, indent):
+        words = " ".join(self.random.choice(["note", "todo", "check", "value", "loop"]) for _ in range(4))
+        if self.random.random() < 0.5:
+            return f"{indent}// {words}\n"
+        return f"{indent}/* {words}\n{indent}   {words} */\n"
+
+    def declaration(self, indent, names):
+        self.statements += 1
+        if self.random.random() < 0.2:
+            name = self.new_name("s")
+            return f'{indent}string {name} = "{self.random.choice(["abc", "hello world", ""])}";\n'
+        name = self.new_name("v")
+        line = f"{indent}{self.random.choice(['int', 'float'])} {name} = {self.expression(names)};\n"
+        names.append(name)
+        return line
+
+    def statement(self, indent, names, depth):
+        roll = self.random.random()
+        if depth < 2 and roll < 0.12:
+            return self.if_statement(indent, names, depth)
+        if depth < 2 and roll < 0.2:
+            return self.for_statement(indent, names, depth)
+        if roll < 0.35 and names:
+            self.statements += 1
+            return f"{indent}{self.random.choice(names)} = {self.expression(names)};\n"
+        if roll < 0.55:
+            self.statements += 1
+            if self.functions and names and self.random.random() < 0.4:
+                name, count = self.random.choice(self.functions)
+                args = ", ".join(self.random.choice(names) for _ in range(count))
+                return f"{indent}print(call {name}({args}));\n"
+            return f"{indent}print({self.expression(names)});\n"
+        return self.declaration(indent, names)
+
+    def block(self, indent, names, depth):
+        inner = indent + "    "
+        names = list(names)
+        body = "".join(self.statement(inner, names, depth + 1) for _ in range(self.random.randint(1, 4)))
+        return body, names
+
+    def if_statement(self, indent, names, depth):
+        self.statements += 1
+        body, _ = self.block(indent, names, depth)
+        text = f"{indent}if {self.condition(names)} {{\n{body}{indent}}}\n"
+        if self.random.random() < 0.5:
+            body, _ = self.block(indent, names, depth)
+            text += f"{indent}else {{\n{body}{indent}}}\n"
+        return text
+
+    def for_statement(self, indent, names, depth):
+        self.statements += 1
+        counter = self.new_name("i")
+        body, _ = self.block(indent, names + [counter], depth)
+        return (f"{indent}for (int {counter} = 0, {counter} < {self.random.randint(1, 100)}, {counter}++) {{\n"
+                f"{body}{indent}}}\n")
+
+    def function(self):
+        self.statements += 2  # the function and its return
+        name = self.new_name("f")
+        params = [self.new_name("p") for _ in range(self.random.randint(0, 3))]
+        signature = ", ".join(f"{self.random.choice(['int', 'float'])} {param}" for param in params)
+        body, names = self.block("", self.numbers + params, 0)
+        self.functions.append((name, len(params)))
+        return f"do {name}({signature}) {{\n{body}    return {self.expression(names)};\n}}\n"
+
+    def generate(self, size):
+        """Returns a program of about size characters and its statement count."""
+        chunks = []
+        length = 0
+        while length < size:
+            roll = self.random.random()
+            if roll < 0.1:
+                chunk = self.comment("")
+            elif roll < 0.25:
+                chunk = self.function()
+            else:
+                chunk = self.statement("", self.numbers, 0)
+            chunks.append(chunk)
+            length += len(chunk)
+        # The parser looks two tokens past an identifier, so never end on one
+        self.statements += 1
+        chunks.append("print(0);\n")
+        return "".join(chunks), self.statements
+
+def generate_program(size, seed=0):
+    return ProgramGenerator(seed).generate(size)
+
+# Stages, each returns the number of tokens it produced or consumed,
+# or None when it does not work on tokens
+def lex_with(engine):
+    def stage(text):
+        tokens, error = runner.run('<bench>', text, engine)
+        if error:
+            raise RuntimeError(error.as_string())
+        return len(tokens)
+    return stage
+
+def stream_stage(text):
+    return sum(1 for _ in runner.iter_tokens(io.StringIO(text)))
+
+def parser_stage(text):
+    stream, error = stream_lexer('<bench>', text).make_tokens()
+    if error:
+        raise RuntimeError(error.as_string())
+    tokens = pipeline.parser_tokens(stream)
+    parsing.Parser(tokens).parse_program()
+    return len(tokens)
+
+def arena_stage(text):
+    stream, error = stream_lexer('<bench>', text).make_tokens()
+    if error:
+        raise RuntimeError(error.as_string())
+    tokens = pipeline.parser_tokens(stream)
+    parsing.Parser(tokens).parse_arena()
+    return len(tokens)
+
+def parallel_stage(text):
+    stream, error = stream_lexer('<bench>', text).make_tokens()
+    if error:
+        raise RuntimeError(error.as_string())
+    tokens = pipeline.parser_tokens(stream)
+    parallel.parse_parallel(tokens)
+    return len(tokens)
+
+def predictive_stage(text):
+    stream, error = stream_lexer('<bench>', text).make_tokens()
+    if error:
+        raise RuntimeError(error.as_string())
+    tokens = pipeline.parser_tokens(stream)
+    predictive.PredictiveParser(tokens).parse_program()
+    return len(tokens)
+
+def table_stage(text):
+    Table.parse_code(text)
+    return None
+
+STAGES = {
+    "lexer": lex_with("classic"),
+    "fast": lex_with("fast"),
+    "compact": lex_with("compact"),
+    "stream": stream_stage,
+    "parser": parser_stage,
+    "arena": arena_stage,
+    "parallel": parallel_stage,
+    "predictive": predictive_stage,
+    "table": table_stage,
+}
+
+def measure(stage, text, memory=True):
+    start = time.perf_counter()
+    tokens = stage(text)
+    seconds = time.perf_counter() - start
+    peak = None
+    if memory:
+        tracemalloc.start()
+        stage(text)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return seconds, tokens, peak
+
+def run_benchmarks(sizes, stages, seed=0, memory=True, max_seconds=None, report=print):
+    results = []
+    too_slow = set()
+    for size in sizes:
+        if too_slow.issuperset(stages):
+            break
+        text, statements = generate_program(parse_size(size), seed)
+        for name in stages:
+            if name in too_slow:
+                report(f"{name:<10}{size:>8}   skipped, slower than {max_seconds} s on a smaller size")
+                continue
+            seconds, tokens, peak = measure(STAGES[name], text, memory)
+            if max_seconds is not None and seconds > max_seconds:
+                too_slow.add(name)
+            result = {
+                "stage": name,
+                "size": size,
+                "chars": len(text),
+                "statements": statements,
+                "tokens": tokens,
+                "seconds": seconds,
+                "tokens_per_sec": tokens / seconds if seconds and tokens is not None else None,
+                "statements_per_sec": statements / seconds if seconds else None,
+                "peak_bytes": peak,
+            }
+            results.append(result)
+            report(format_result(result))
+    return results
+
+def format_result(result):
+    peak = result["peak_bytes"]
+    memory = f"{peak / (1 << 20):10.2f} MB" if peak is not None else f"{'-':>13}"
+    tokens_per_sec = result["tokens_per_sec"]
+    tokens = f"{tokens_per_sec:16,.0f} tok/s" if tokens_per_sec is not None else f"{'-':>22}"
+    statements_per_sec = result["statements_per_sec"] or 0
+    return (f"{result['stage']:<10}{result['size']:>8}{result['seconds']:12.4f} s"
+            f"{tokens}{statements_per_sec:14,.0f} stmt/s{memory}")
+
+def scaling(results):
+    """Scaling exponent of time against input size between neighbouring sizes."""
+    curves = {}
+    for result in results:
+        curves.setdefault(result["stage"], []).append(result)
+    exponents = {}
+    for stage, points in curves.items():
+        exponents[stage] = []
+        for small, large in zip(points, points[1:]):
+            if small["seconds"] > 0 and large["chars"] > small["chars"]:
+                exponent = math.log(large["seconds"] / small["seconds"]) / math.log(large["chars"] / small["chars"])
+                exponents[stage].append((small["size"], large["size"], exponent))
+    return exponents
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Lexer and parser benchmarks on generated programs.")
+    arg_parser.add_argument("--sizes", default=",".join(SIZES), help="comma separated sizes, e.g. 1KB,10MB,100MB")
+    arg_parser.add_argument("--stages", default=",".join(STAGES), help="comma separated stages: " + ", ".join(STAGES))
+    arg_parser.add_argument("--seed", type=int, default=0)
+    arg_parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc run for peak memory")
+    arg_parser.add_argument("--max-seconds", type=float, default=60, help="stop growing a stage after a run this long")
+    arg_parser.add_argument("--json", help="also write the results to this file")
+    arg_parser.add_argument("--write-corpus", metavar="SIZE", help="only write a generated program of SIZE to stdout")
+    args = arg_parser.parse_args(argv)
+
+    if args.write_corpus:
+        print(generate_program(parse_size(args.write_corpus), args.seed)[0], end="")
+        return
+
+    sizes = [size for size in args.sizes.split(",") if size]
+    stages = [stage for stage in args.stages.split(",") if stage]
+    print(f"{'stage':<10}{'size':>8}{'time':>14}{'tokens/sec':>22}{'statements/sec':>21}{'peak memory':>13}")
+    results = run_benchmarks(sizes, stages, args.seed, not args.no_memory, args.max_seconds)
+
+    print("\nScaling exponent (1.0 = linear):")
+    for stage, exponents in scaling(results).items():
+        steps = "  ".join(f"{small}->{large}: {exponent:.2f}" for small, large, exponent in exponents)
+        print(f"{stage:<10}{steps}")
+
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({"results": results, "scaling": scaling(results)}, file, indent=2)
+
+if __name__ == "__main__":
+    main()
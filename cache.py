@@ -0,0 +1,298 @@
+# cache.py
+# On-disk cache of token streams and parse trees, keyed by a hash of the
+# source text together with the lexer and grammar versions, so a file that
+# has not changed is loaded instead of lexed and parsed again.
+#
+#   python cache.py            number and size of the entries
+#   python cache.py --prune --max-mb 64
+#   python cache.py --clear
+#
+# Each entry is one binary file: a fixed header, then the TokenStream arrays
+# and the parsetree.ParseTree arrays as raw bytes. Entries are written to a
+# temporary file and renamed into place, so readers in other processes see
+# either the old file or the new one, never half of one. Entries are touched
+# when read; pruning drops the ones unused for longer than max_age and then
+# the least recently used until the cache fits in max_bytes.
+import argparse
+import hashlib
+import os
+import struct
+import sys
+import tempfile
+import time
+from array import array
+
+from parsetree import ParseTree
+from tokenstream import TokenStream
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+def files_digest(names):
+    digest = hashlib.sha256()
+    for name in names:
+        try:
+            with open(os.path.join(HERE, name), 'rb') as file:
+                digest.update(file.read())
+        except OSError:
+            digest.update(name.encode())
+    return digest.hexdigest()[:16]
+
+# Any change to these files makes every older entry a miss
+LEXER_VERSION = files_digest(["basic.py", "tokenstream.py"])
+GRAMMAR_VERSION = files_digest(["analysis.py", "First2.py", "follow.py", "grammar.bnf", "grammarc.py", "parsing.py", "parsetree.py", "pipeline.py"])
+
+MAGIC = b"PTC2"
+# magic, key, tokens, nodes, spans, symbols, symbol bytes, parse error bytes, flags,
+# parse error index (-1 if none)
+HEADER = struct.Struct("<4s32sIIIIIIIq")
+HAS_TREE = 1
+HAS_ERROR = 2
+
+MAX_BYTES = 256 << 20
+MAX_AGE = 30 * 24 * 3600
+PRUNE_INTERVAL = 3600   # seconds between automatic prunes
+
+class CacheEntry:
+    def __init__(self, stream, tree=None, parse_error=None, error_index=None):
+        self.stream = stream            # TokenStream
+        self.tree = tree                # ParseTree, None if not parsed yet
+        self.parse_error = parse_error  # ParseError message, if parsing failed
+        self.error_index = error_index  # and its index, if it had one
+
+class DiskCache:
+    def __init__(self, directory, max_bytes=MAX_BYTES, max_age=MAX_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    def key(self, text):
+        digest = hashlib.sha256()
+        digest.update(f"{LEXER_VERSION}:{GRAMMAR_VERSION}:{sys.byteorder}:".encode())
+        digest.update(text.encode('utf-8', 'surrogatepass'))
+        return digest.digest()
+
+    def path(self, key):
+        name = key.hex()
+        return os.path.join(self.directory, name[:2], name + ".bin")
+
+    def get(self, text):
+        """The CacheEntry stored for text, or None."""
+        key = self.key(text)
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as file:
+                data = file.read()
+        except OSError:
+            return None
+        entry = decode(data, key, text)
+        if entry is None:  # Damaged or from another format, drop it
+            remove(path)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def put(self, text, stream, tree=None, parse_error=None, error_index=None):
+        """Stores the tokens of text, with its parse tree or parse error if known."""
+        key = self.key(text)
+        path = self.path(key)
+        data = encode(key, stream, tree, parse_error, error_index)
+        if data is None:
+            return False
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            handle, temp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(handle, 'wb') as file:
+                    file.write(data)
+                os.replace(temp, path)
+            except BaseException:
+                remove(temp)
+                raise
+        except OSError:
+            return False
+        self.maybe_prune()
+        return True
+
+    def entries(self):
+        """(path, size, mtime) of every file in the cache."""
+        try:
+            subdirs = os.listdir(self.directory)
+        except OSError:
+            return []
+        entries = []
+        for subdir in subdirs:
+            folder = os.path.join(self.directory, subdir)
+            if not os.path.isdir(folder):
+                continue
+            for name in os.listdir(folder):
+                path = os.path.join(folder, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def prune(self, now=None):
+        """Removes old entries, then the least recently used ones over max_bytes.
+
+        Returns the number of files removed.
+        """
+        now = time.time() if now is None else now
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for path, size, mtime in entries:
+            if now - mtime <= self.max_age and total <= self.max_bytes:
+                break
+            if remove(path):
+                removed += 1
+            total -= size
+        return removed
+
+    def maybe_prune(self):
+        """Prunes if no process has done so for PRUNE_INTERVAL seconds."""
+        stamp = os.path.join(self.directory, "last-prune")
+        try:
+            if time.time() - os.stat(stamp).st_mtime < PRUNE_INTERVAL:
+                return
+        except OSError:
+            pass
+        try:
+            with open(stamp, 'w'):
+                pass
+        except OSError:
+            return
+        self.prune()
+
+    def clear(self):
+        removed = 0
+        for path, _, _ in self.entries():
+            removed += remove(path)
+        return removed
+
+def remove(path):
+    # Another process may have removed it first
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
+
+def encode(key, stream, tree, parse_error, error_index=None):
+    """Entry bytes, None if the tree holds leaves that are not strings."""
+    kinds, starts, ends = stream.kinds, stream.starts, stream.ends
+    flags = 0
+    node_arrays = ()
+    symbols = b""
+    lengths = array('I')
+    if tree is not None:
+        flags |= HAS_TREE
+        encoded = []
+        for symbol in tree.symbols[3:]:
+            if not isinstance(symbol, str):
+                return None
+            encoded.append(symbol.encode('utf-8', 'surrogatepass'))
+        lengths.extend(len(symbol) for symbol in encoded)
+        symbols = b"".join(encoded)
+        node_arrays = (tree.kinds, tree.next_sibling, tree.statement, tree.span_starts, tree.span_ends)
+    error = b""
+    if parse_error is not None:
+        flags |= HAS_ERROR
+        error = parse_error.encode('utf-8', 'surrogatepass')
+    header = HEADER.pack(MAGIC, key, len(kinds), len(tree.kinds) if tree is not None else 0,
+                         len(tree.span_starts) if tree is not None else 0,
+                         len(lengths), len(symbols), len(error), flags,
+                         error_index if error_index is not None else -1)
+    parts = [header, kinds.tobytes(), starts.tobytes(), ends.tobytes()]
+    parts.extend(items.tobytes() for items in node_arrays)
+    parts.extend([lengths.tobytes(), symbols, error])
+    return b"".join(parts)
+
+def decode(data, key, text):
+    """CacheEntry from entry bytes, None unless they are a whole entry for key."""
+    if len(data) < HEADER.size:
+        return None
+    magic, stored_key, tokens, nodes, spans, symbol_count, symbol_bytes, error_bytes, flags, error_index = \
+        HEADER.unpack_from(data)
+    if magic != MAGIC or stored_key != key:
+        return None
+    view = memoryview(data)
+    offset = HEADER.size
+
+    def read(typecode, count):
+        nonlocal offset
+        items = array(typecode)
+        size = items.itemsize * count
+        items.frombytes(view[offset:offset + size])
+        offset += size
+        return items
+
+    expected = (HEADER.size + tokens * 9 + nodes * 12 + spans * 8 + symbol_count * 4
+                + symbol_bytes + error_bytes)
+    if len(data) != expected:
+        return None
+    stream = TokenStream(text)
+    stream.kinds = read('B', tokens)
+    stream.starts = read('I', tokens)
+    stream.ends = read('I', tokens)
+    tree = None
+    if flags & HAS_TREE:
+        tree = ParseTree()
+        tree.kinds = read('I', nodes)
+        tree.next_sibling = read('i', nodes)
+        tree.statement = read('I', nodes)
+        tree.span_starts = read('I', spans)
+        tree.span_ends = read('I', spans)
+    lengths = read('I', symbol_count)
+    if tree is not None:
+        position = offset
+        for length in lengths:
+            tree.symbols.append(bytes(view[position:position + length]).decode('utf-8', 'surrogatepass'))
+            position += length
+        tree.symbol_ids = {symbol: i for i, symbol in enumerate(tree.symbols) if i > 2}
+    offset += symbol_bytes
+    parse_error = None
+    if flags & HAS_ERROR:
+        parse_error = bytes(view[offset:offset + error_bytes]).decode('utf-8', 'surrogatepass')
+    return CacheEntry(stream, tree, parse_error, error_index if error_index >= 0 else None)
+
+# Cache used by pipeline.load: $PARSE_CACHE_DIR, or ~/.cache/parse-cache.
+# PARSE_CACHE=0 turns it off.
+_default = None
+
+def default_directory():
+    return os.environ.get("PARSE_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "parse-cache")
+
+def default_cache():
+    global _default
+    if os.environ.get("PARSE_CACHE") == "0":
+        return None
+    if _default is None:
+        _default = DiskCache(default_directory())
+    return _default
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Inspect or trim the token and parse tree cache.")
+    arg_parser.add_argument("--dir", help="cache directory, default $PARSE_CACHE_DIR or ~/.cache/parse-cache")
+    arg_parser.add_argument("--prune", action="store_true", help="drop old entries and trim to --max-mb")
+    arg_parser.add_argument("--clear", action="store_true", help="remove every entry")
+    arg_parser.add_argument("--max-mb", type=float, default=MAX_BYTES / (1 << 20))
+    arg_parser.add_argument("--max-days", type=float, default=MAX_AGE / (24 * 3600))
+    args = arg_parser.parse_args(argv)
+
+    directory = args.dir or default_directory()
+    cache = DiskCache(directory, int(args.max_mb * (1 << 20)), args.max_days * 24 * 3600)
+    if args.clear:
+        print(f"removed {cache.clear()} entries")
+    elif args.prune:
+        print(f"removed {cache.prune()} entries")
+    entries = cache.entries()
+    size = sum(size for _, size, _ in entries)
+    print(f"{directory}: {len(entries)} entries, {size / (1 << 20):.2f} MB")
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,7 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext
-import runner
-import First2
-import follow
 import parsing  # Import the parsing module
-from Table import SymbolTable
+import pipeline
 import Table
 
 mytokens = []
@@ -34,9 +31,8 @@ def display_file_content(entry, display_text_widget):
 
 def display_tokens(input_file, output_text_widget):
     try:
-        with open(input_file, 'r') as file:
-            text = file.read()
-        tokens, error = runner.run('<code.txt>', text)
+        source = pipeline.load(input_file)  # Lexed once, shared by every button
+        tokens, error = source.tokens, source.error
         
         if error:
             output_text_widget.delete('1.0', tk.END)
@@ -57,47 +53,37 @@ def display_tokens(input_file, output_text_widget):
 
 def display_first_sets(input_file, output_text_widget):
     try:
-        with open(input_file, 'r') as file:
-            text = file.read()
-        tokens, _ = runner.run('<code.txt>', text)
-        printed_token_types = set()
+        source = pipeline.load(input_file)
         output_text_widget.delete('1.0', tk.END)
         output_text_widget.insert(tk.END, "First Sets:\n")
-        for token in tokens:
-            token_type = token[0]
-            if token_type not in printed_token_types:
-                printed_token_types.add(token_type)
-                first_set = First2.FIRST.get(token_type, [token_type])
-                output_text_widget.insert(tk.END, f"FIRST({token_type}) = {{ {', '.join(sorted(first_set))} }}\n")
+        for token_type, first_set in source.first_sets():
+            output_text_widget.insert(tk.END, f"FIRST({token_type}) = {{ {', '.join(sorted(first_set))} }}\n")
     except Exception as e:
         messagebox.showerror("Error", f"An error occurred: {e}")
 
 def display_follow_sets(input_file, output_text_widget):
     try:
-        with open(input_file, 'r') as file:
-            text = file.read()
-        tokens, _ = runner.run('<code.txt>', text)
-        printed_token_types = set()
+        source = pipeline.load(input_file)
         output_text_widget.delete('1.0', tk.END)
         output_text_widget.insert(tk.END, "Follow Sets:\n")
-        for token in tokens:
-            token_type = token[0]
-            if token_type not in printed_token_types:
-                printed_token_types.add(token_type)
-                follow_set = follow.FOLLOW.get(token_type, [token_type])
-                output_text_widget.insert(tk.END, f"FOLLOW({token_type}) = {{ {', '.join(sorted(follow_set))} }}\n")
+        for token_type, follow_set in source.follow_sets():
+            output_text_widget.insert(tk.END, f"FOLLOW({token_type}) = {{ {', '.join(sorted(follow_set))} }}\n")
     except Exception as e:
         messagebox.showerror("Error", f"An error occurred: {e}")
 
+# Stream over a text widget, for the parsing.write_tree printers
+class WidgetWriter:
+    def __init__(self, widget):
+        self.widget = widget
+
+    def write(self, text):
+        self.widget.insert(tk.END, text)
+
 # New function to create the parse tree window
 def display_parse_tree(input_file):
     try:
-        # Assuming the parsing module has a method to generate the parse tree
-        with open(input_file, 'r') as file:
-            text = file.read()
-        code = parsing.tokenize(text)
-        parse = parsing.Parser(code)  # Placeholder for actual parse tree generation method
-        parse_tree= parse.parse_program()
+        # Parsed from the same tokens as the other buttons, or read from the cache
+        parse_tree = pipeline.load(input_file).parse_arena()
         # Create a new window for the parse tree
         parse_tree_window = tk.Toplevel()
         parse_tree_window.title("Parse Tree")
@@ -106,20 +92,15 @@ def display_parse_tree(input_file):
         parse_tree_text = scrolledtext.ScrolledText(parse_tree_window, wrap=tk.WORD, width=80, height=20)
         parse_tree_text.pack(pady=20)
 
-        # Display the parse tree in the text widget
-        parse_tree_text.insert(tk.END, parsing.pretty_print(parse_tree))
+        # Write the parse tree into the text widget a chunk at a time
+        parsing.write_tree(parse_tree, WidgetWriter(parse_tree_text))
     except Exception as e:
         messagebox.showerror("Error", f"An error occurred while generating the parse tree: {e}")
         
 def display_symbol_table(input_file, output_text_widget):
     try:
-        # Read the input file content
-        with open(input_file, 'r') as file:
-            text = file.read()
-
-        # Create an instance of SymbolTable
-        symbol_table = SymbolTable()
-        symbol_table = Table.parse_code(text)  # Use the 'parse_code' function to parse the code and populate the symbol table
+        # Symbol table built from the shared token stream
+        symbol_table = pipeline.load(input_file).symbol_table()
 
         # Create a temporary file to hold the symbol table output
         symbol_table_output = "symbol_table_output.txt"
@@ -137,9 +118,8 @@ def display_symbol_table(input_file, output_text_widget):
 
 def display_hash_table(input_file, output_text_widget):
     try:
-        with open(input_file, 'r') as file:
-            text = file.read()
-        symbol_table = Table.parse_code(text)
+        source = pipeline.load(input_file)
+        text = source.text
         
         # Calculate the hash values for the variables
         hash_max = 4
@@ -0,0 +1,322 @@
+# grammarc.py
+# Grammar compiler. Reads a grammar written in BNF and writes one JSON
+# artifact with everything the tools use: symbol ids, nullable nonterminals,
+# FIRST, FOLLOW and the LL(1) predict sets and table. First2, follow and
+# predictive load the artifact instead of analysing grammars of their own.
+#
+#   python grammarc.py                      grammar.bnf -> grammar.json
+#   python grammarc.py parser.bnf           parser.bnf -> parser.json
+#   python grammarc.py grammar.bnf --check  fail if grammar.json is out of date
+#   python grammarc.py parser.bnf --strict  fail if parser.bnf is not LL(1)
+#
+# The artifact records a hash of the BNF text. When the source has changed
+# since, load() warns and compiles it in memory; only this script writes
+# artifacts.
+#
+# Symbol ids: terminals come first, numbered as the bits of the FIRST,
+# FOLLOW and predict masks (analysis.EPSILON is 0, END 1), then the
+# nonterminals. Masks are hex strings, as JSON numbers past 4300 digits
+# cannot be read back. Productions are lists of symbol ids, numbered in the
+# order of the source. On a conflict the table keeps the earliest production and
+# the clash is listed under "conflicts".
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import tempfile
+import warnings
+
+from analysis import EPSILON, EPSILON_BIT, END, GrammarAnalysis, load_analysis
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REFERENCE = "grammar.bnf"   # First2 and follow
+PARSER = "parser.bnf"       # predictive
+FORMAT = 2                  # bump when the artifact layout or the analysis changes
+
+BNF_TOKEN = re.compile(r"""'[^'\n]*'|"[^"\n]*"|::=|\||#.*|[^\s|]+""")
+NONTERMINAL = re.compile(r"<[^<>\s]+>\Z")
+
+class GrammarError(Exception):
+    pass
+
+def parse_bnf(text, name='<bnf>'):
+    """Productions and start symbol of a BNF text.
+
+    Returns ({nonterminal: [symbol tuples]}, start); the start symbol is the
+    first one defined. Raises GrammarError on malformed or undefined rules.
+    """
+    productions = {}
+    used = {}  # nonterminal -> line of its first use
+    nonterminal = alternative = None
+    for number, line in enumerate(text.splitlines(), 1):
+        tokens = []
+        for match in BNF_TOKEN.finditer(line):
+            token = match.group()
+            if token[0] == '#':
+                break
+            tokens.append(token)
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            if i + 1 < len(tokens) and tokens[i + 1] == "::=":
+                if not NONTERMINAL.match(token):
+                    raise GrammarError(f"{name}:{number}: {token} is not a <nonterminal>")
+                if token in productions:
+                    raise GrammarError(f"{name}:{number}: {token} is defined twice")
+                nonterminal, alternative = token, []
+                productions[token] = [alternative]
+                i += 2
+                continue
+            if nonterminal is None or token == "::=":
+                raise GrammarError(f"{name}:{number}: expected <nonterminal> ::=, found {token}")
+            if token == "|":
+                alternative = []
+                productions[nonterminal].append(alternative)
+            elif token == EPSILON:
+                alternative.append(None)
+            elif token[0] in "'\"" and len(token) > 1:
+                alternative.append(token[1:-1])
+            else:
+                if NONTERMINAL.match(token):
+                    used.setdefault(token, number)
+                alternative.append(token)
+            i += 1
+    if not productions:
+        raise GrammarError(f"{name}: no rules")
+    for symbol, number in used.items():
+        if symbol not in productions:
+            raise GrammarError(f"{name}:{number}: {symbol} is used but never defined")
+    result = {}
+    for nonterminal, alternatives in productions.items():
+        result[nonterminal] = []
+        for alternative in alternatives:
+            if not alternative:
+                raise GrammarError(f"{name}: empty alternative of {nonterminal}, write epsilon")
+            result[nonterminal].append(tuple(symbol for symbol in alternative if symbol is not None))
+    return result, next(iter(productions))
+
+def compile_grammar(productions, start, source=None):
+    """Artifact dict of {nonterminal: [symbol sequences]}, see CompiledGrammar.
+
+    source is the digest of the BNF text the grammar was read from. Such a
+    grammar has its own artifact, so only grammars without one go through
+    the analysis cache of analysis.load_analysis.
+    """
+    for alternatives in productions.values():
+        for production in alternatives:
+            for symbol in production:
+                if symbol in (EPSILON, END) and symbol not in productions:
+                    raise GrammarError(f"{symbol} is reserved and cannot be a terminal")
+    analysis = GrammarAnalysis(productions, start) if source is not None else load_analysis(productions, start)
+    nullable, first, follow = analysis.nullable, analysis.first_bits, analysis.follow_bits
+    terminals = analysis.bits.terminals
+    nonterminals = list(productions)
+    ids = {terminal: number for number, terminal in enumerate(terminals)}
+    ids.update((nonterminal, len(terminals) + number) for number, nonterminal in enumerate(nonterminals))
+
+    encoded = []
+    predict = []
+    table = []
+    conflicts = []
+    for number, nonterminal in enumerate(nonterminals):
+        row = {}
+        taken = 0
+        for production in productions[nonterminal]:
+            lookaheads = analysis.predict_bits(nonterminal, production)
+            index = len(encoded)
+            encoded.append([number, [ids[symbol] for symbol in production]])
+            predict.append(lookaheads)
+            clash = lookaheads & taken
+            while clash:
+                low = clash & -clash
+                terminal = low.bit_length() - 1
+                conflicts.append([number, terminal, [row[terminal], index]])
+                clash ^= low
+            fresh = lookaheads & ~taken
+            taken |= lookaheads
+            while fresh:
+                low = fresh & -fresh
+                row[low.bit_length() - 1] = index
+                fresh ^= low
+        table.append(sorted(row.items()))
+    # One entry per terminal, listing every production it predicts
+    merged = {}
+    for number, terminal, clash in conflicts:
+        merged.setdefault((number, terminal), [clash[0]]).append(clash[1])
+    return {
+        "format": FORMAT,
+        "source": source,
+        "start": start,
+        "terminals": terminals,
+        "nonterminals": nonterminals,
+        "productions": encoded,
+        "nullable": sorted(ids[symbol] for symbol in nullable),
+        "first": [f"{first.get(nonterminal, 0):x}" for nonterminal in nonterminals],
+        "follow": [f"{follow.get(nonterminal, 0):x}" for nonterminal in nonterminals],
+        "predict": [f"{mask:x}" for mask in predict],
+        "table": [[list(entry) for entry in row] for row in table],
+        "conflicts": [[number, terminal, clash] for (number, terminal), clash in merged.items()],
+    }
+
+def source_digest(text):
+    return hashlib.sha256(text.encode('utf-8', 'surrogatepass')).hexdigest()
+
+class CompiledGrammar:
+    """A compiled artifact, with its ids turned back into symbol names."""
+    def __init__(self, data):
+        self.data = data
+        self.start = data["start"]
+        self.terminals = data["terminals"]
+        self.nonterminals = data["nonterminals"]
+        self.symbols = self.terminals + self.nonterminals   # id -> name
+        self.symbol_ids = {symbol: number for number, symbol in enumerate(self.symbols)}
+        symbols = self.symbols
+        self.productions = [(self.nonterminals[head], tuple(symbols[symbol] for symbol in body))
+                            for head, body in data["productions"]]
+        self.alternatives = {nonterminal: [] for nonterminal in self.nonterminals}
+        for number, (nonterminal, _) in enumerate(self.productions):
+            self.alternatives[nonterminal].append(number)
+        self.nullable = {symbols[symbol] for symbol in data["nullable"]}
+        self.first_bits = {nonterminal: int(mask, 16) for nonterminal, mask in zip(self.nonterminals, data["first"])}
+        self.follow_bits = {nonterminal: int(mask, 16) for nonterminal, mask in zip(self.nonterminals, data["follow"])}
+        self.predict = [int(mask, 16) for mask in data["predict"]]
+        self.table = {nonterminal: {self.terminals[terminal]: production for terminal, production in row}
+                      for nonterminal, row in zip(self.nonterminals, data["table"])}
+        self.conflicts = [(self.nonterminals[number], self.terminals[terminal], productions)
+                          for number, terminal, productions in data["conflicts"]]
+
+    def decode(self, mask):
+        """Set of the terminals in mask."""
+        terminals = self.terminals
+        result = set()
+        while mask:
+            low = mask & -mask
+            result.add(terminals[low.bit_length() - 1])
+            mask ^= low
+        return result
+
+    def first_of(self, symbols):
+        """FIRST of a symbol sequence, with EPSILON if all of it can be empty."""
+        mask = 0
+        for symbol in symbols:
+            if symbol not in self.first_bits:
+                return self.decode(mask) | {symbol}
+            mask |= self.first_bits[symbol]
+            if symbol not in self.nullable:
+                return self.decode(mask)
+        return self.decode(mask | EPSILON_BIT)
+
+    def first_sets(self):
+        """FIRST of every nonterminal as a set, with EPSILON if it is nullable."""
+        return {nonterminal: self.decode(mask | (EPSILON_BIT if nonterminal in self.nullable else 0))
+                for nonterminal, mask in self.first_bits.items()}
+
+    def follow_sets(self):
+        """FOLLOW of every nonterminal as a set."""
+        return {nonterminal: self.decode(mask) for nonterminal, mask in self.follow_bits.items()}
+
+    def predict_set(self, production):
+        """Lookahead terminals of the production numbered production."""
+        return self.decode(self.predict[production])
+
+    def show(self, production):
+        nonterminal, body = self.productions[production]
+        return f"{nonterminal} ::= {' '.join(body) or EPSILON}"
+
+def compile_bnf(text, name='<bnf>'):
+    productions, start = parse_bnf(text, name)
+    return compile_grammar(productions, start, source_digest(text))
+
+def artifact_path(source):
+    return os.path.splitext(source)[0] + ".json"
+
+def write_artifact(path, data):
+    """Writes data as JSON through a temporary file; False if that fails."""
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        handle, temp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(handle, 'w') as file:
+                json.dump(data, file, separators=(",", ":"))
+                file.write("\n")
+            os.replace(temp, path)
+        except BaseException:
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+            raise
+    except OSError:
+        return False
+    return True
+
+def read_artifact(path, text):
+    """Artifact dict at path if it was compiled from text by this FORMAT, else None."""
+    try:
+        with open(path, 'r') as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("format") != FORMAT or data.get("source") != source_digest(text):
+        return None
+    return data
+
+# Compiled grammars by source path, loaded on first use
+_loaded = {}
+
+def load(source=REFERENCE):
+    """CompiledGrammar of a BNF file, read from its artifact.
+
+    If the artifact is missing or out of date, this warns and compiles the
+    grammar in memory without writing anything.
+    """
+    path = os.path.join(HERE, source)
+    compiled = _loaded.get(path)
+    if compiled is None:
+        with open(path, 'r') as file:
+            text = file.read()
+        data = read_artifact(artifact_path(path), text)
+        if data is None:
+            warnings.warn(f"{artifact_path(source)} is out of date, run python grammarc.py {source}", stacklevel=2)
+            data = compile_bnf(text, os.path.basename(path))
+        compiled = _loaded[path] = CompiledGrammar(data)
+    return compiled
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Compile a BNF grammar into its JSON artifact.")
+    arg_parser.add_argument("source", nargs="?", default=REFERENCE)
+    arg_parser.add_argument("-o", "--output", help="artifact path, default the source with .json")
+    arg_parser.add_argument("--check", action="store_true", help="only check that the artifact is up to date")
+    arg_parser.add_argument("--strict", action="store_true",
+                            help="fail without writing the artifact if the grammar is not LL(1)")
+    args = arg_parser.parse_args(argv)
+
+    output = args.output or artifact_path(args.source)
+    with open(args.source, 'r') as file:
+        text = file.read()
+    if args.check:
+        if read_artifact(output, text) is None:
+            print(f"{output} is out of date, run python grammarc.py {args.source}")
+            return 1
+        print(f"{output} is up to date")
+        return 0
+    try:
+        data = compile_bnf(text, args.source)
+    except GrammarError as error:
+        print(error)
+        return 1
+    if args.strict and data["conflicts"]:
+        print(f"{args.source}: {len(data['conflicts'])} LL(1) conflicts, see python ll1report.py {args.source}")
+        return 1
+    if not write_artifact(output, data):
+        print(f"cannot write {output}")
+        return 1
+    compiled = CompiledGrammar(data)
+    print(f"{output}: {len(compiled.nonterminals)} nonterminals, {len(compiled.terminals) - 2} terminals, "
+          f"{len(compiled.productions)} productions, {len(compiled.conflicts)} LL(1) conflicts")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
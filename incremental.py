@@ -0,0 +1,646 @@
+# incremental.py
+# Re-lexing after an edit. The lexer starts every token from the same
+# neutral state, so after an edit it is enough to scan from the end of the
+# last token before the edit until a new token starts where an old one did
+# (past the edited text); from there on both token streams are identical.
+#
+# Offsets after an edit shift by the edit's change in length. Instead of
+# rewriting every later offset, the shift is kept pending for all tokens
+# from index `gap` on and only applied to the tokens the gap moves over,
+# like the gap of a gap buffer. Edits close to each other stay cheap.
+#
+# Re-parsing works the same way one level up, on top-level statements.
+# Each statement remembers the first lexer token it was parsed from, how
+# far the parser looked and which identifiers it looked up. After an edit,
+# parsing restarts at the first statement that looked at a changed token
+# and stops as soon as a new statement starts where an old one did, past
+# the edit, and no statement from there on looks up an identifier whose
+# declaration the edit changed; every statement from there on is reused.
+#
+# An edit that falls inside a <block> of one top-level statement, without
+# touching its braces, is re-parsed inside the innermost such block the same
+# way: from the first statement of the block that looked at a changed token
+# until a new statement starts where an old one did, or the block ends at
+# its old '}'. Those statements must still introduce every identifier the
+# old ones did, and any other they introduce must be new to the program;
+# otherwise the whole top-level statement is parsed again. The positions of
+# the blocks after the edit in that statement are still moved one by one,
+# which is cheap next to parsing them.
+import math
+from array import array
+from bisect import bisect_right
+
+import parsing
+from basic import LexemeTable, LineIndex, Position, lexeme_kind, scan_tokens
+from pipeline import split_tokens
+from tokenstream import TokenStream, stream_lexer
+
+FIRST_WINDOW = 256
+END_REACH = 1 << 62  # reach of a statement that looked at the end of input
+
+class IncrementalLexer:
+    def __init__(self, fname, text):
+        self.fname = fname
+        self.relex_all(text)
+
+    def relex_all(self, text):
+        self.text = text
+        stream, self.error = stream_lexer(self.fname, text).make_tokens()
+        if self.error:
+            stream = TokenStream(text)
+        # Signed offsets, since a pending shift can make stored values negative
+        self.kinds = stream.kinds
+        self.starts = array('q', stream.starts)
+        self.ends = array('q', stream.ends)
+        self.gap = len(self.kinds)
+        self.delta = 0
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def start(self, i):
+        return self.starts[i] + self.delta if i >= self.gap else self.starts[i]
+
+    def end(self, i):
+        return self.ends[i] + self.delta if i >= self.gap else self.ends[i]
+
+    def move_gap(self, index):
+        """Applies the pending shift so that it starts at token index."""
+        low, high = sorted((index, self.gap))
+        delta = self.delta if index > self.gap else -self.delta
+        if delta and low < high:
+            for offsets in (self.starts, self.ends):
+                offsets[low:high] = array('q', [offset + delta for offset in offsets[low:high]])
+        self.gap = index
+
+    def last_token_before(self, offset):
+        """Index of the last token ending before offset, or -1."""
+        low, high = 0, len(self.kinds)
+        while low < high:
+            mid = (low + high) // 2
+            if self.end(mid) < offset:
+                low = mid + 1
+            else:
+                high = mid
+        return low - 1
+
+    def edit(self, offset, deleted, inserted):
+        """Replaces text[offset:offset + deleted] with inserted and re-lexes.
+
+        Returns (first, removed, added): tokens first .. first + removed of
+        the old stream were replaced by `added` new tokens. Returns None if
+        the new text has a lexing error, which is then kept in self.error
+        until an edit fixes it.
+        """
+        old_text = self.text
+        text = old_text[:offset] + inserted + old_text[offset + deleted:]
+        if self.error:  # No tokens to reuse
+            self.relex_all(text)
+            return None if self.error else (0, 0, len(self.kinds))
+
+        change = len(inserted) - deleted
+        first = self.last_token_before(offset) + 1
+        self.move_gap(first)
+        pos = self.ends[first - 1] if first else 0
+        edit_end = offset + len(inserted)   # end of the edited text in text
+        count = len(self.kinds)
+        old = first                          # next old token that could line up
+        lines = LineIndex(text)
+        kinds, starts, ends = array('B'), array('q'), array('q')
+        synced = False
+        window = FIRST_WINDOW + len(inserted)
+
+        while not synced:
+            stop = min(len(text), pos + window)
+            final = stop == len(text)
+            tokens, spans = [], []
+            make_pos = lambda index, base=pos: Position(base + index, self.fname, text, lines)
+            scanned, error = scan_tokens(text[pos:stop], 0, tokens, LexemeTable(), make_pos, final, spans)
+            if error:
+                self.text = text
+                self.error = error
+                return None
+
+            for start, end in spans:
+                start += pos
+                end += pos
+                if start >= edit_end:
+                    old_start = start - change
+                    while old < count and self.start(old) < old_start:
+                        old += 1
+                    if old < count and self.start(old) == old_start:
+                        synced = True
+                        break
+                kinds.append(lexeme_kind(text[start:end]))
+                starts.append(start)
+                ends.append(end)
+
+            pos += scanned
+            if final:
+                break
+            window *= 2
+
+        if not synced:
+            old = count
+        self.kinds[first:old] = kinds
+        self.starts[first:old] = starts
+        self.ends[first:old] = ends
+        self.text = text
+        self.gap = first + len(kinds)
+        self.delta += change
+        return first, old - first, len(kinds)
+
+    def stream(self):
+        """Current tokens as a TokenStream, or ([], error) like make_tokens."""
+        if self.error:
+            return [], self.error
+        self.move_gap(len(self.kinds))
+        stream = TokenStream(self.text)
+        stream.kinds = array('B', self.kinds)
+        stream.starts = array('I', self.starts)
+        stream.ends = array('I', self.ends)
+        return stream, None
+
+# Top-level statements parsed together: one, unless a statement boundary
+# falls inside the parser tokens of one lexer token
+class Record:
+    def __init__(self):
+        self.statements = []
+        self.introduced = {}     # identifiers first seen here -> how many came before
+        self.names = set()       # identifiers looked up in Parser.ids
+        self.order = 0.0         # increases along the records, kept across edits
+        self.blocks = []         # Block of every <block>, inner ones first
+
+class Block:
+    """A <block> of a record. Positions are lexer tokens counted from the
+    start of the record; entry, exit and entries count the identifiers the
+    record had introduced at '{', at '}' and at each statement."""
+    def __init__(self, start, entry):
+        self.node = None
+        self.start = start       # '{'
+        self.end = None          # token after '}'
+        self.entry = entry
+        self.exit = None
+        self.starts = []         # statement starts
+        self.reaches = None      # token after the last one a statement or one before it looked at
+        self.entries = []
+        self.restartable = True  # False if a restart could not line up with lexer tokens
+
+    def shift(self, position, change, extra):
+        """Moves everything at or after position by change tokens and extra identifiers."""
+        if self.start >= position:
+            self.start += change
+            self.entry += extra
+        if self.end >= position:
+            self.end += change
+            self.exit += extra
+        i = bisect_right(self.starts, position - 1)
+        if i < len(self.starts):
+            self.starts[i:] = array('q', [offset + change for offset in self.starts[i:]])
+            if extra:
+                self.entries[i:] = [count + extra for count in self.entries[i:]]
+        i = bisect_right(self.reaches, position - 1)
+        if i < len(self.reaches):
+            self.reaches[i:] = array('q', [offset + change for offset in self.reaches[i:]])
+
+class BlockParser(parsing.Parser):
+    """parsing.Parser that notes where each <block> and its statements start."""
+    def __init__(self, tokens):
+        super().__init__(tokens)
+        self.blocks = []  # finished blocks, inner ones first, in parser tokens
+        self.open = []
+
+    def parse_block(self):
+        block = Block(self.current, self.ids.count)
+        self.open.append(block)
+        try:
+            block.node = super().parse_block()
+        finally:
+            self.open.pop()
+        block.end = self.current
+        block.exit = self.ids.count
+        self.blocks.append(block)
+        return block.node
+
+    def parse_recovering_statement(self):
+        if self.open:
+            block = self.open[-1]
+            block.starts.append(self.current)
+            block.entries.append(self.ids.count)
+        return super().parse_recovering_statement()
+
+class RegionIds:
+    """Parser.ids while a region is re-parsed.
+
+    Holds the identifiers introduced by records before the region, read
+    from owners, and the ones the region adds.
+    """
+    def __init__(self, owners, limit):
+        self.owners = owners
+        self.limit = limit     # order of the first re-parsed record
+        self.added = set()
+        self.record = None  # record being parsed
+
+    @property
+    def count(self):
+        return len(self.record.introduced)
+
+    def __contains__(self, name):
+        self.record.names.add(name)
+        if name in self.added:
+            return True
+        owner = self.owners.get(name)
+        return owner is not None and owner.order < self.limit
+
+    def add(self, name):
+        if name not in self:
+            self.added.add(name)
+            self.record.introduced[name] = len(self.record.introduced)
+
+class BlockIds:
+    """Parser.ids while statements of one block of record are re-parsed.
+
+    entry is how many identifiers the record had introduced before the
+    first of them; the ones it introduced later are not known yet.
+    """
+    def __init__(self, owners, record, entry):
+        self.owners = owners
+        self.record = record
+        self.entry = entry
+        self.added = {}     # identifier -> its number in record.introduced
+        self.names = set()  # identifiers looked up
+
+    @property
+    def count(self):
+        return self.entry + len(self.added)
+
+    def __contains__(self, name):
+        self.names.add(name)
+        if name in self.added or self.record.introduced.get(name, math.inf) < self.entry:
+            return True
+        owner = self.owners.get(name)
+        return owner is not None and owner.order < self.record.order
+
+    def add(self, name):
+        if name not in self:
+            self.added[name] = self.count
+
+class IncrementalParser:
+    def __init__(self, fname, text):
+        self.lexer = IncrementalLexer(fname, text)
+        self.records = []
+        self.owners = {}  # identifier -> record that introduced it
+        self.users = {}   # identifier -> records that looked it up
+        # Per record, the lexer token it starts at and the lexer token after
+        # the last one it or a record before it looked at, with a pending
+        # shift like the lexer's
+        self.starts = array('q')
+        self.reaches = array('q')
+        self.gap = 0
+        self.delta = 0
+        self.error = self.lexer.error
+        if not self.error:
+            self.reparse(0, 0, 0)
+
+    def start(self, i):
+        return self.starts[i] + self.delta if i >= self.gap else self.starts[i]
+
+    def reach(self, i):
+        return self.reaches[i] + self.delta if i >= self.gap else self.reaches[i]
+
+    def move_gap(self, index):
+        low, high = sorted((index, self.gap))
+        delta = self.delta if index > self.gap else -self.delta
+        if delta and low < high:
+            for offsets in (self.starts, self.reaches):
+                offsets[low:high] = array('q', [offset + delta for offset in offsets[low:high]])
+        self.gap = index
+
+    def first_affected(self, token):
+        """Index of the first record that looked at lexer token `token` or later."""
+        low, high = 0, len(self.records)
+        while low < high:
+            mid = (low + high) // 2
+            if self.reach(mid) <= token:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def edit(self, offset, deleted, inserted):
+        """Replaces text[offset:offset + deleted] with inserted and re-parses.
+
+        Returns (first, removed, added): records first .. first + removed
+        were replaced by `added` new ones, or (first, 1, 1) if only a block
+        of record first was re-parsed. Returns None if the new text has
+        a lexing or parse error, which is then kept in self.error; the next
+        edit parses everything again.
+        """
+        stale = self.error is not None
+        changed = self.lexer.edit(offset, deleted, inserted)
+        if changed is None:
+            self.error = self.lexer.error
+            return None
+        self.error = None
+        if stale:
+            removed = len(self.records)
+            self.records, self.owners, self.users = [], {}, {}
+            self.starts, self.reaches = array('q'), array('q')
+            self.gap, self.delta = 0, 0
+            added = self.reparse(0, 0, 0)
+            return None if added is None else (0, removed, added)
+
+        first, removed, added = changed
+        index = self.first_affected(first)
+        if self.reparse_block(index, first, removed, added):
+            return index, 1, 1
+        result = self.reparse(index, first + added, added - removed)
+        if result is None:
+            return None
+        return (index,) + result
+
+    def reparse(self, index, sync_from, change):
+        """Parses from record index on, until a statement starts at an old
+        record start at or after lexer token sync_from.
+
+        Returns (removed, added) in records, or None on a parse error.
+        """
+        records = self.records
+        count = len(records)
+        self.move_gap(index)
+        token = self.start(index) if index < count else 0
+        sources = []
+        parser = BlockParser(self.parser_tokens(token, sources))
+        ids = parser.ids = RegionIds(self.owners, records[index].order if index < count else math.inf)
+        new, starts, reaches = [], array('q'), array('q')
+        reach = self.reach(index - 1) if index else 0
+        old = index
+        old_names = set()
+        last_uses = {}
+        synced = False
+
+        try:
+            while parser.peek() is not None:
+                current = parser.current
+                # A new record can only start where a lexer token does
+                if not new or sources[current] != sources[current - 1]:
+                    token = sources[current]
+                    # Records after a lone '"' may change the text it reads to
+                    if token >= sync_from and reach != END_REACH:
+                        target = token - change
+                        while old < count and self.start(old) < target:
+                            old_names.update(records[old].introduced)
+                            old += 1
+                        if old < count and self.start(old) == target:
+                            order = records[old].order
+                            if all(self.last_use(name, last_uses) < order for name in old_names ^ ids.added):
+                                synced = True
+                                break
+                    record = Record()
+                    new.append(record)
+                    starts.append(token)
+                    reaches.append(reach)
+                ids.record = record
+                record.statements.append(parser.parse_statement())
+                if parser.blocks:
+                    record.blocks.extend(self.place_blocks(parser, sources, starts[-1]))
+                reach = max(reach, self.reach_of(parser.tokens, sources, current, parser.current))
+                reaches[-1] = reach
+        except parsing.ParseError as error:
+            self.error = error
+            return None
+
+        if not synced:
+            old = count
+        owners, users = self.owners, self.users
+        for record in records[index:old]:
+            for name in record.introduced:
+                if owners.get(name) is record:
+                    del owners[name]
+            for name in record.names:
+                users[name].discard(record)
+                if not users[name]:
+                    del users[name]
+        for record in new:
+            for name in record.introduced:
+                owners[name] = record
+            for name in record.names:
+                users.setdefault(name, set()).add(record)
+
+        low = records[index - 1].order if index else None
+        high = records[old].order if old < count else None
+        if low is None:
+            low = (high if high is not None else 0.0) - len(new) - 1
+        if high is None:
+            high = low + len(new) + 1
+        step = (high - low) / (len(new) + 1)
+        orders = [low + step * (i + 1) for i in range(len(new))]
+        for record, order in zip(new, orders):
+            record.order = order
+        records[index:old] = new
+        self.starts[index:old] = starts
+        self.reaches[index:old] = reaches
+        self.gap = index + len(new)
+        self.delta += change
+        # Renumber when the orders between two records run out
+        if orders and not (low < orders[0] and orders[-1] < high and
+                           all(a < b for a, b in zip(orders, orders[1:]))):
+            for i, record in enumerate(records):
+                record.order = float(i)
+        return old - index, len(new)
+
+    def reparse_block(self, index, first, removed, added):
+        """Re-parses lexer tokens first .. first + removed, which became
+        `added` new ones, inside the innermost block of record index around
+        them. Returns False, changing nothing, if that cannot be done."""
+        records = self.records
+        if index >= len(records) or self.reach(index) == END_REACH:
+            return False
+        record = records[index]
+        base = self.start(index)
+        edit = first - base
+        for position, block in enumerate(record.blocks):
+            if block.restartable and block.start < edit and edit + removed < block.end:
+                break
+        else:
+            return False
+        change = added - removed
+        sync_from = edit + added
+        count = len(block.starts)
+        first_statement = bisect_right(block.reaches, edit)
+        restart = block.starts[first_statement] if first_statement < count else block.end - 1
+        entry = block.entries[first_statement] if first_statement < count else block.exit
+
+        sources = []
+        parser = BlockParser(self.parser_tokens(base + restart, sources))
+        ids = parser.ids = BlockIds(self.owners, record, entry)
+        new, starts, entries = [], array('q'), []
+        reaches = array('q')
+        reach = block.reaches[first_statement - 1] if first_statement else block.start + 1
+        old = first_statement
+        try:
+            while True:
+                text = parser.peek()
+                current = parser.current
+                if text is None or (current and sources[current] == sources[current - 1]):
+                    return False
+                token = sources[current] - base
+                if token >= sync_from:
+                    target = token - change
+                    while old < count and block.starts[old] < target:
+                        old += 1
+                    at_end = text == "}" and target == block.end - 1
+                    if at_end or (old < count and block.starts[old] == target):
+                        high = block.entries[old] if old < count else block.exit
+                        fresh = self.fresh_names(ids.added, record, entry, high)
+                        if fresh is not None:
+                            break
+                        if at_end:
+                            return False
+                if text == "}":
+                    return False
+                starts.append(token)
+                entries.append(ids.count)
+                new.append(parser.parse_statement())
+                reach = max(reach, self.reach_of(parser.tokens, sources, current, parser.current) - base)
+                if reach >= END_REACH - base:
+                    return False
+                reaches.append(reach)
+        except parsing.ParseError:
+            return False
+
+        # Numbers of the identifiers follow their new order
+        extra = len(fresh)
+        if extra:
+            introduced = record.introduced
+            for name, number in introduced.items():
+                if number >= high:
+                    introduced[name] = number + extra
+            for name in fresh:
+                self.owners[name] = record
+        record.introduced.update(ids.added)
+        record.names |= ids.names
+        for name in ids.names:
+            self.users.setdefault(name, set()).add(record)
+        end = block.starts[old] if old < count else block.end - 1
+        # Blocks inside the replaced statements go, the new ones come in
+        # before their enclosing blocks
+        inner = [other for other in record.blocks[:position]
+                 if not (restart <= other.start and other.end <= end)]
+        outer = record.blocks[position:]
+        for other in inner + outer:
+            if other.end >= end:
+                other.shift(end, change, extra)
+        record.blocks = inner + self.place_blocks(parser, sources, base) + outer
+        block.starts[first_statement:old] = starts
+        block.reaches[first_statement:old] = reaches
+        block.entries[first_statement:old] = entries
+        block.node[1][first_statement:old] = new
+        # Reaches of the reused statements stay at least those before them
+        i = first_statement + len(new)
+        while i < len(block.reaches) and block.reaches[i] < reach:
+            block.reaches[i] = reach
+            i += 1
+        self.move_gap(index + 1)
+        self.reaches[index] += change
+        self.delta += change
+        return True
+
+    def fresh_names(self, added, record, low, high):
+        """Identifiers of added that record did not introduce as numbers low
+        .. high. None unless added has all of those and no record introduced
+        or looked up the others."""
+        fresh = []
+        for name in added:
+            number = record.introduced.get(name)
+            if number is not None and low <= number < high:
+                continue
+            if number is not None or name in self.owners or name in self.users:
+                return None
+            fresh.append(name)
+        return fresh if len(added) - len(fresh) == high - low else None
+
+    def place_blocks(self, parser, sources, base):
+        """Takes parser.blocks, with lexer token positions counted from base."""
+        tokens = parser.tokens
+        blocks, parser.blocks = parser.blocks, []
+        for block in blocks:
+            last = block.end - 1  # '}'
+            positions = [block.start] + block.starts + [last]
+            # A restart must fall where a lexer token starts
+            block.restartable = all(p == 0 or sources[p] != sources[p - 1] for p in positions)
+            ends = block.starts[1:] + [last]
+            reach = 0
+            reaches = array('q')
+            for start, end in zip(block.starts, ends):
+                reach = max(reach, self.reach_of(tokens, sources, start, end))
+                if reach == END_REACH:
+                    block.restartable = False
+                reaches.append(reach - base)
+            block.reaches = reaches
+            block.starts = array('q', [sources[p] - base for p in block.starts])
+            block.start = sources[block.start] - base
+            block.end = sources[last] + 1 - base
+        return blocks
+
+    def last_use(self, name, cache):
+        """Order of the last record that looked up name."""
+        order = cache.get(name)
+        if order is None:
+            order = cache[name] = max((record.order for record in self.users.get(name, ())), default=-math.inf)
+        return order
+
+    @staticmethod
+    def reach_of(tokens, sources, start, end):
+        """Lexer token after the last one the statement tokens[start:end] looked at."""
+        # The parser looks at most two tokens past the end of a statement,
+        # and a lone '"' was only split off because no '"' follows it
+        i = start
+        try:
+            while i <= end:
+                if tokens[i] == '"':
+                    return END_REACH
+                i += 1
+            tokens[i]
+            unit = sources[i]
+            while True:
+                if tokens[i] == '"':
+                    return END_REACH
+                if sources[i] != unit:
+                    return sources[i]
+                i += 1
+        except IndexError:
+            return END_REACH
+
+    def parser_tokens(self, index, sources):
+        """Yields the parser tokens from lexer token index on, appending their
+        lexer token indices to sources."""
+        lexer = self.lexer
+        text, count = lexer.text, len(lexer)
+        window = FIRST_WINDOW
+        while index < count:
+            stop = min(count, index + window)
+            final = stop == count
+            base = lexer.start(index)
+            stream = TokenStream(text[base:] if final else text[base:lexer.end(stop - 1)])
+            for i in range(index, stop):
+                stream.append(lexer.kinds[i], lexer.start(i) - base, lexer.end(i) - base)
+            tokens, split = [], []
+            done = split_tokens(stream, tokens, final, split)
+            sources.extend([index + source for source in split])
+            yield from tokens
+            if done:
+                index += done
+            else:
+                window *= 2
+
+    def statements(self):
+        return [statement for record in self.records for statement in record.statements]
+
+    def tree(self):
+        """The tree parsing.Parser.parse_program gives for the current text,
+        None while self.error is set. Subtrees are shared with the trees of
+        earlier calls; a block an edit was re-parsed in changes in place."""
+        if self.error:
+            return None
+        return ["<program>", ["<statement>*", self.statements()]]
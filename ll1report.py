@@ -0,0 +1,372 @@
+# ll1report.py
+# LL(1) check of a BNF grammar: the predict set of every production, and
+# every conflict with example input that runs into it.
+#
+#   python ll1report.py                      grammar.bnf
+#   python ll1report.py parser.bnf --strict  exit status 1 unless it is LL(1)
+#   python ll1report.py grammar.bnf --predict --json report.json
+#
+# Conflicts come from the compiled grammar (see grammarc.py), grouped by
+# nonterminal and clashing productions with every lookahead they clash on.
+# Examples are built from shortest derivations: the input that brings the
+# parser from the start symbol to the nonterminal with such a lookahead
+# next, then what each production would go on to read. A production that
+# can be empty reads nothing there, so the lookahead has to come after the
+# nonterminal; that context is found by walking FOLLOW back up the grammar.
+# Each of these is one pass over the grammar or one search per conflict, so
+# grammars with tens of thousands of productions take seconds.
+import argparse
+import heapq
+import json
+import sys
+from collections import deque
+
+import grammarc
+from analysis import END
+
+EXAMPLE_TOKENS = 12   # tokens shown per example, the rest is cut to "..."
+STEPS = 50            # expansions allowed per token shown, for rules that derive nothing
+
+class ConflictExamples:
+    """Example inputs for the conflicts of a grammarc.CompiledGrammar."""
+    def __init__(self, compiled, limit=EXAMPLE_TOKENS):
+        self.compiled = compiled
+        self.limit = limit
+        self.heads = [head for head, _ in compiled.productions]
+        self.bodies = [body for _, body in compiled.productions]
+        self.first = compiled.first_bits   # also the set of nonterminals
+        self.nullable = compiled.nullable
+        self.bit = {terminal: 1 << number for number, terminal in enumerate(compiled.terminals)}
+
+        # FIRST of every suffix of every body, and where its nullable tail starts
+        self.suffix_first = []
+        self.nullable_from = []
+        self.occurrences = {}  # nonterminal -> [(production, position)]
+        for number, body in enumerate(self.bodies):
+            masks = [0] * (len(body) + 1)
+            start = len(body)
+            for i in range(len(body) - 1, -1, -1):
+                symbol = body[i]
+                if symbol in self.first:
+                    self.occurrences.setdefault(symbol, []).append((number, i))
+                    masks[i] = self.first[symbol] | (masks[i + 1] if symbol in self.nullable else 0)
+                    if symbol in self.nullable and start == i + 1:
+                        start = i
+                else:
+                    masks[i] = self.bit[symbol]
+            self.suffix_first.append(masks)
+            self.nullable_from.append(start)
+        self.best = self.shortest_derivations()
+        self.reach = self.shortest_prefixes()
+
+    def shortest_derivations(self):
+        """Nonterminal -> production of its smallest derivation tree (Knuth's algorithm).
+
+        A tree costs one per token and one per production used. Nonterminals
+        that derive no finite string are left out.
+        """
+        users = {}
+        remaining = []
+        cost = []
+        heap = []
+        for number, body in enumerate(self.bodies):
+            count = 0
+            for symbol in body:
+                if symbol in self.first:
+                    users.setdefault(symbol, []).append(number)
+                    count += 1
+            remaining.append(count)
+            cost.append(1 + len(body) - count)
+            if not count:
+                heap.append((cost[number], number))
+        heapq.heapify(heap)
+        best = {}
+        self.size = {}
+        while heap:
+            size, number = heapq.heappop(heap)
+            head = self.heads[number]
+            if head in best:
+                continue
+            best[head] = number
+            self.size[head] = size
+            for user in users.get(head, ()):
+                cost[user] += size
+                remaining[user] -= 1
+                if not remaining[user]:
+                    heapq.heappush(heap, (cost[user], user))
+        return best
+
+    def shortest_prefixes(self):
+        """Nonterminal -> (production, position) it is reached through from the start symbol (Dijkstra).
+
+        The start symbol maps to None; unreachable nonterminals are left out.
+        """
+        start = self.compiled.start
+        distance = {start: 0}
+        reach = {start: None}
+        heap = [(0, start)]
+        while heap:
+            so_far, head = heapq.heappop(heap)
+            if so_far > distance[head]:
+                continue
+            for number in self.compiled.alternatives[head]:
+                running = so_far + 1
+                for i, symbol in enumerate(self.bodies[number]):
+                    if symbol in self.first:
+                        if running < distance.get(symbol, running + 1):
+                            distance[symbol] = running
+                            reach[symbol] = (number, i)
+                            heapq.heappush(heap, (running, symbol))
+                        if symbol not in self.size:
+                            break  # no finite string, nothing after it is reachable
+                        running += self.size[symbol]
+                    else:
+                        running += 1
+        return reach
+
+    def expand(self, symbols, limit, reverse=False):
+        """Tokens of the smallest derivations of symbols, at most limit of them.
+
+        With reverse=True they are the last tokens, last first. Returns
+        (tokens, complete).
+        """
+        tokens = []
+        stack = list(symbols) if reverse else list(reversed(symbols))
+        steps = limit * STEPS
+        while stack:
+            if len(tokens) >= limit or steps <= 0:
+                return tokens, False
+            steps -= 1
+            symbol = stack.pop()
+            if symbol not in self.first:
+                tokens.append(symbol)
+                continue
+            number = self.best.get(symbol)
+            if number is None:
+                return tokens, False
+            body = self.bodies[number]
+            stack.extend(body if reverse else reversed(body))
+        return tokens, True
+
+    def tail(self, segments):
+        """Last tokens of the symbol sequences in segments, which go innermost first."""
+        tokens = []
+        for symbols in segments:
+            part, complete = self.expand(symbols, self.limit - len(tokens), reverse=True)
+            tokens.extend(part)
+            if not complete:
+                return ["..."] + tokens[::-1]
+        return tokens[::-1]
+
+    def reach_segments(self, nonterminal):
+        """Symbol sequences before nonterminal on its way from the start symbol, innermost first."""
+        if nonterminal not in self.reach:
+            return [("...",)]  # not reachable from the start symbol
+        segments = []
+        step = self.reach[nonterminal]
+        while step is not None:
+            number, position = step
+            segments.append(self.bodies[number][:position])
+            step = self.reach[self.heads[number]]
+        return segments
+
+    def starting_with(self, symbols, terminal):
+        """Tokens of a derivation of symbols that starts with terminal, None if there is none."""
+        bit = self.bit[terminal]
+        body, position = tuple(symbols), self.first_position(symbols, bit)
+        if position is None:
+            return None
+        path = [(body, position)]  # (body, position) from the outside in
+        if body[position] in self.first:
+            found = self.first_path(body[position], bit)
+            if found is None:
+                return None
+            path.extend(found)
+        # terminal, then what follows it at every level, innermost level first
+        tokens = [terminal]
+        for body, position in reversed(path):
+            if len(tokens) >= self.limit:
+                break
+            part, complete = self.expand(body[position + 1:], self.limit - len(tokens))
+            tokens.extend(part)
+            if not complete:
+                break
+        else:
+            return tokens
+        return tokens + ["..."]
+
+    def first_position(self, body, bit):
+        """First position of body that can begin with bit, after a nullable prefix."""
+        for position, symbol in enumerate(body):
+            if symbol in self.first:
+                if self.first[symbol] & bit:
+                    return position
+                if symbol not in self.nullable:
+                    return None
+            else:
+                return position if self.bit[symbol] & bit else None
+        return None
+
+    def first_path(self, nonterminal, bit):
+        """Shortest chain of (body, position) from nonterminal down to the terminal bit."""
+        parent = {nonterminal: None}
+        queue = deque([nonterminal])
+        while queue:
+            head = queue.popleft()
+            for number in self.compiled.alternatives[head]:
+                body = self.bodies[number]
+                position = self.first_position(body, bit)
+                if position is None:
+                    continue
+                symbol = body[position]
+                if symbol not in self.first:
+                    path = [(body, position)]
+                    while parent[head] is not None:
+                        head, step = parent[head]
+                        path.append(step)
+                    return path[::-1]
+                if symbol not in parent:
+                    parent[symbol] = (head, (body, position))
+                    queue.append(symbol)
+        return None
+
+    def follow_context(self, nonterminal, terminal):
+        """(tokens before nonterminal, tokens after it starting with terminal) of some input.
+
+        Walks up from nonterminal through the productions it ends, to one
+        where terminal comes right after it.
+        """
+        bit = self.bit[terminal]
+        parent = {nonterminal: None}
+        queue = deque([nonterminal])
+        while queue:
+            symbol = queue.popleft()
+            found = None
+            if symbol == self.compiled.start and terminal == END:
+                found = (None, None)
+            for number, position in self.occurrences.get(symbol, ()):
+                if found is not None:
+                    break
+                if self.suffix_first[number][position + 1] & bit:
+                    found = (number, position)
+                elif self.nullable_from[number] <= position + 1:
+                    head = self.heads[number]
+                    if head not in parent and self.compiled.follow_bits[head] & bit:
+                        parent[head] = (symbol, number, position)
+                        queue.append(head)
+            if found is None:
+                continue
+            number, position = found
+            if number is None:
+                segments, after = self.reach_segments(symbol), [END]
+            else:
+                body = self.bodies[number]
+                segments = [body[:position]] + self.reach_segments(self.heads[number])
+                after = self.starting_with(body[position + 1:], terminal)
+            # Levels between symbol and nonterminal, then innermost first
+            inner = []
+            while parent[symbol] is not None:
+                symbol, number, position = parent[symbol]
+                inner.append(self.bodies[number][:position])
+            return self.tail(inner[::-1] + segments), after
+        return None
+
+    def example(self, nonterminal, productions, terminal):
+        """(input before nonterminal, [tokens each production reads]) with terminal next."""
+        reads = [self.starting_with(self.bodies[number], terminal) for number in productions]
+        after = None
+        if any(tokens is None for tokens in reads):
+            context = self.follow_context(nonterminal, terminal)
+            if context is not None:
+                before, after = context
+        if after is None:
+            before = self.tail(self.reach_segments(nonterminal))
+        # A production that reads nothing here leaves the lookahead to what follows
+        reads = [tokens if tokens is not None else [] for tokens in reads]
+        return before, reads, after
+
+def conflict_groups(compiled):
+    """[(nonterminal, production numbers, terminals)], one per set of clashing productions."""
+    groups = {}
+    for nonterminal, terminal, productions in compiled.conflicts:
+        groups.setdefault((nonterminal, tuple(productions)), []).append(terminal)
+    return [(nonterminal, list(productions), terminals)
+            for (nonterminal, productions), terminals in groups.items()]
+
+def build_report(compiled, name, predict=False, limit=EXAMPLE_TOKENS):
+    """JSON-ready report of the LL(1) conflicts of compiled, and its predict sets if asked."""
+    groups = conflict_groups(compiled)
+    examples = ConflictExamples(compiled, limit) if groups else None
+    conflicts = []
+    for nonterminal, productions, terminals in groups:
+        before, reads, after = examples.example(nonterminal, productions, terminals[0])
+        conflicts.append({
+            "nonterminal": nonterminal,
+            "lookaheads": terminals,
+            "input": before,
+            "lookahead": terminals[0],
+            "productions": [{"production": compiled.show(number), "reads": tokens}
+                            for number, tokens in zip(productions, reads)],
+            "after": after,
+        })
+    report = {
+        "grammar": name,
+        "nonterminals": len(compiled.nonterminals),
+        "productions": len(compiled.productions),
+        "ll1": not conflicts,
+        "conflicts": conflicts,
+    }
+    if predict:
+        report["predict"] = [{"production": compiled.show(number),
+                              "predict": sorted(compiled.predict_set(number))}
+                             for number in range(len(compiled.productions))]
+    return report
+
+def format_report(report):
+    lines = [f"{report['grammar']}: {report['nonterminals']} nonterminals, {report['productions']} productions, "
+             + ("LL(1)" if report["ll1"] else f"{len(report['conflicts'])} LL(1) conflicts")]
+    for conflict in report["conflicts"]:
+        lines.append("")
+        lines.append(f"{conflict['nonterminal']} on {' '.join(conflict['lookaheads'])}")
+        lines.append(f"  after {' '.join(conflict['input']) or 'no input'}, next token {conflict['lookahead']}:")
+        for production in conflict["productions"]:
+            reads = " ".join(production["reads"]) or f"nothing, {' '.join(conflict['after'] or ['?'])} follows"
+            lines.append(f"    {production['production']}")
+            lines.append(f"        reads {reads}")
+    if "predict" in report:
+        lines.append("")
+        lines.append("Predict sets:")
+        for entry in report["predict"]:
+            lines.append(f"  {entry['production']}  {{ {', '.join(entry['predict'])} }}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Report the LL(1) conflicts and predict sets of a BNF grammar.")
+    arg_parser.add_argument("source", nargs="?", default=grammarc.REFERENCE)
+    arg_parser.add_argument("--predict", action="store_true", help="list the predict set of every production")
+    arg_parser.add_argument("--json", help="write the report as JSON to this file, - for stdout")
+    arg_parser.add_argument("--strict", action="store_true", help="exit with status 1 if the grammar is not LL(1)")
+    arg_parser.add_argument("--tokens", type=int, default=EXAMPLE_TOKENS, help="tokens per example")
+    args = arg_parser.parse_args(argv)
+
+    with open(args.source, 'r') as file:
+        text = file.read()
+    try:
+        data = grammarc.read_artifact(grammarc.artifact_path(args.source), text) or grammarc.compile_bnf(text, args.source)
+    except grammarc.GrammarError as error:
+        print(error)
+        return 1
+    report = build_report(grammarc.CompiledGrammar(data), args.source, args.predict, args.tokens)
+    if args.json:
+        output = json.dumps(report, indent=2) + "\n"
+        if args.json == "-":
+            sys.stdout.write(output)
+        else:
+            with open(args.json, 'w') as file:
+                file.write(output)
+    if args.json != "-":
+        print(format_report(report))
+    return 1 if args.strict and not report["ll1"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,4 @@
-import runner
-import First2
-import follow
+import pipeline
 mytokens = []
 
 def count_unique_tokens(tokens):
@@ -11,12 +9,9 @@ def count_unique_tokens(tokens):
 
 def process_code(input_file, output_file):
     try:
-        # Read code from the input file
-        with open(input_file, 'r') as code_file:
-            text = code_file.read()
-
-        # Tokenize the input code
-        tokens, error = runner.run('<code.txt>', text)
+        # Read and tokenize the input code once for every section below
+        source = pipeline.load(input_file)
+        tokens, error = source.tokens, source.error
 
         # Write results to the output file
         with open(output_file, 'w') as out_file:
@@ -35,36 +30,16 @@ def process_code(input_file, output_file):
 
                 # Compute and write FIRST sets for the relevant token types
                 out_file.write('_' * 15 + " First Set " + '_' * 15 + '\n\n')
-                printed_token_types = set()  # Track printed token types
-                for token in tokens:
-                    token_type = token[0]
-                    if token_type not in printed_token_types:
-                        printed_token_types.add(token_type)
-                        
-                        # Explicitly handle the number token type
-                        # if token_type == "<number>":
-                        #     first_set = [str(token.value)]  # Add the number value to the FIRST set
-                        # else:
-                        first_set = First2.FIRST.get(token_type, [token_type])
-
-                        # Write the FIRST set
-                        first_set_sorted = sorted(first_set)
-                        out_file.write(f"FIRST({token_type}) = {{ {', '.join(first_set_sorted)} }}\n")
+                for token_type, first_set in source.first_sets():
+                    # Write the FIRST set
+                    first_set_sorted = sorted(first_set)
+                    out_file.write(f"FIRST({token_type}) = {{ {', '.join(first_set_sorted)} }}\n")
 
 
                 out_file.write('_' * 15 + " Follow Set " + '_' * 15 + '\n\n')
-                printed_token_types = set()  # Track printed token types
-                for token in tokens:
-                    token_type = token[0]
-                    if token_type not in printed_token_types:
-                        printed_token_types.add(token_type)
-                        
-                        
-                        follow_set = follow.FOLLOW.get(token_type, [token_type])
-
-                    
-                        follow_set_sorted = sorted(follow_set)
-                        out_file.write(f"FOLLOW({token_type}) = {{ {', '.join(follow_set_sorted)} }}\n")
+                for token_type, follow_set in source.follow_sets():
+                    follow_set_sorted = sorted(follow_set)
+                    out_file.write(f"FOLLOW({token_type}) = {{ {', '.join(follow_set_sorted)} }}\n")
 
 
 
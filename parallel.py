@@ -0,0 +1,153 @@
+# parallel.py
+# Parsing top-level functions and blocks on a process pool. A brace-matching
+# scan of the parser tokens finds where top-level `do` statements and blocks
+# may start; the token list is cut there into chunks of similar size and
+# every chunk is parsed by parsing.Parser in a worker.
+#
+# A chunk is parsed before the identifiers declared ahead of it are known,
+# so the worker guesses that every identifier of the program other than a
+# keyword is declared and reports which names its answers depended on. The
+# chunks are then stitched in source order: one is kept only if the
+# statements before it end exactly where it starts and every guess it used
+# was right. Any other chunk is parsed again here, so the tree and any
+# ParseError are the ones Parser.parse_program gives.
+#
+# Parse trees are nested lists without cycles, so the cycle collector is
+# paused while they are built and unpickled; otherwise it spends more time
+# walking the growing tree than the parse and the transfer take.
+import gc
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import parsing
+
+MIN_CHUNK = 2000     # tokens, smaller chunks cost more to send than to parse
+CHUNKS_PER_WORKER = 4
+KEYWORDS = {"do", "return", "call", "print", "if", "elif", "else", "for",
+            "int", "float", "string", "and", "or"}
+
+def split_points(tokens):
+    """Token indices where a top-level function or block may start."""
+    points = []
+    depth = 0
+    previous = "}"
+    for i, token in enumerate(tokens):
+        if token == "{":
+            # A '{' right after another statement's '}' opens a block,
+            # after anything else it may belong to an if or a loop
+            if depth == 0 and previous == "}":
+                points.append(i)
+            depth += 1
+        elif token == "}":
+            if depth:
+                depth -= 1
+        elif token == "do" and depth == 0:
+            points.append(i)
+        previous = token
+    return points
+
+def chunk_bounds(tokens, chunks):
+    """(start, end) token ranges, cut at split_points, about len(tokens) / chunks long."""
+    size = max(MIN_CHUNK, len(tokens) // max(chunks, 1))
+    bounds = []
+    start = 0
+    for point in split_points(tokens):
+        if point - start >= size:
+            bounds.append((start, point))
+            start = point
+    bounds.append((start, len(tokens)))
+    return bounds
+
+class SpeculativeIds:
+    """Parser.ids of a chunk parsed without the identifiers declared before it.
+
+    Names in `known` count as declared, others do not; the names answered
+    either way are collected in `assumed` and `denied` to be checked once
+    the real set is known.
+    """
+    def __init__(self, known):
+        self.known = known
+        self.added = set()
+        self.assumed = set()
+        self.denied = set()
+
+    def __contains__(self, name):
+        if name in self.added:
+            return True
+        if name in self.known:
+            self.assumed.add(name)
+            return True
+        self.denied.add(name)
+        return False
+
+    def add(self, name):
+        self.added.add(name)
+
+# Guessed identifiers of the program, set once per worker process
+_known = frozenset()
+
+def set_known(known):
+    global _known
+    _known = known
+
+def parse_chunk(tokens, end):
+    """Parses tokens[:end] as whole statements; tokens holds two more for lookahead.
+
+    Returns (statements, added, assumed, denied), or None if the statements
+    do not end exactly at end or parsing fails.
+    """
+    parser = parsing.Parser(tokens)
+    parser.ids = ids = SpeculativeIds(_known)
+    statements = []
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        while parser.current < end:
+            statements.append(parser.parse_statement())
+    except Exception:  # Parsed again in order, which raises it for real
+        return None
+    finally:
+        if enabled:
+            gc.enable()
+    if parser.current != end:
+        return None
+    return statements, ids.added, ids.assumed, ids.denied
+
+def parse_parallel(tokens, workers=None):
+    """Parses like parsing.Parser(tokens).parse_program(), on `workers` processes."""
+    tokens = list(tokens)
+    workers = workers or os.cpu_count() or 1
+    bounds = chunk_bounds(tokens, workers * CHUNKS_PER_WORKER)
+    if workers == 1 or len(bounds) == 1:
+        return parsing.Parser(tokens).parse_program()
+
+    known = frozenset(token for token in set(tokens) if token.isidentifier()) - KEYWORDS
+    parser = parsing.Parser(tokens)
+    statements = []
+    executor = ProcessPoolExecutor(workers, initializer=set_known, initargs=(known,))
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        futures = [executor.submit(parse_chunk, tokens[start:end + 2], end - start) for start, end in bounds]
+        for (start, end), future in zip(bounds, futures):
+            while parser.current < start:
+                statements.append(parser.parse_statement())
+            if parser.current != start:  # A statement ran past the cut
+                future.cancel()
+                continue
+            result = future.result()
+            if result is None:
+                continue
+            chunk, added, assumed, denied = result
+            if not assumed <= parser.ids or not denied.isdisjoint(parser.ids):
+                continue
+            statements.extend(chunk)
+            parser.ids |= added
+            parser.current = end
+        while parser.peek() is not None:
+            statements.append(parser.parse_statement())
+    finally:
+        if enabled:
+            gc.enable()
+        executor.shutdown(cancel_futures=True)
+    return ["<program>", ["<statement>*", statements]]
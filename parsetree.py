@@ -0,0 +1,157 @@
+# parsetree.py
+# Flat parse tree. Every node of the nested-list tree from parsing.Parser
+# (each list and each leaf) is one record in parallel arrays: its kind, its
+# next sibling and the statement it belongs to. Nodes are stored in preorder,
+# so the first child of a non-empty list is the node right after it. Leaf
+# values are interned in one symbol list and statements keep their token span.
+from array import array
+
+LIST = 0    # kind of a non-empty list, any kind above EMPTY indexes symbols
+NONE = 1    # kind of a None leaf (a match that found nothing)
+EMPTY = 2   # kind of an empty list
+
+class ParseTree:
+    def __init__(self):
+        self.symbols = [list, None, list]
+        self.symbol_ids = {}
+        self.kinds = array('I')
+        self.next_sibling = array('i')
+        self.statement = array('I')     # per node, index into the span arrays
+        self.span_starts = array('I')
+        self.span_ends = array('I')
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def nbytes(self):
+        """Bytes held by the node and span arrays."""
+        return sum(items.itemsize * len(items) for items in
+                   (self.kinds, self.next_sibling, self.statement, self.span_starts, self.span_ends))
+
+    def add_span(self, start, end):
+        self.span_starts.append(start)
+        self.span_ends.append(end)
+        return len(self.span_starts) - 1
+
+    def add(self, value, span=(0, 0), spans=None):
+        """Stores a list-form tree and returns the index of its root.
+
+        spans maps id() of lists to their token span; nodes of other lists
+        take the span of the closest list above them that has one.
+        """
+        kinds, next_sibling, statement = self.kinds, self.next_sibling, self.statement
+        symbols, symbol_ids = self.symbols, self.symbol_ids
+        root = len(kinds)
+        if spans and isinstance(value, list):
+            span = spans.get(id(value), span)
+        stack = [(iter([value]), -1, self.add_span(*span))]
+        while stack:
+            items, previous, owner = stack[-1]
+            item = next(items, stack)
+            if item is stack:  # List done
+                stack.pop()
+                continue
+            index = len(kinds)
+            if previous != -1:
+                next_sibling[previous] = index
+            stack[-1] = (items, index, owner)
+            next_sibling.append(-1)
+            if isinstance(item, list):
+                if spans and id(item) in spans:
+                    span = spans[id(item)]
+                    if span != (self.span_starts[owner], self.span_ends[owner]):
+                        owner = self.add_span(*span)
+                statement.append(owner)
+                if item:
+                    kinds.append(LIST)
+                    stack.append((iter(item), -1, owner))
+                else:
+                    kinds.append(EMPTY)
+                continue
+            if item is None:
+                kind = NONE
+            else:
+                kind = symbol_ids.get(item)
+                if kind is None:
+                    kind = symbol_ids[item] = len(symbols)
+                    symbols.append(item)
+            kinds.append(kind)
+            statement.append(owner)
+        return root
+
+    def attach(self, parent, previous, child):
+        """Links child after previous, or as the first child of parent if previous is -1.
+
+        Nodes stay in preorder only if child is added right after the last
+        node of the subtree of parent.
+        """
+        if previous == -1:
+            if child != parent + 1:
+                raise ValueError("first child must follow its parent")
+            self.kinds[parent] = LIST
+        else:
+            self.next_sibling[previous] = child
+
+    def is_list(self, index):
+        return self.kinds[index] in (LIST, EMPTY)
+
+    def value(self, index):
+        """Leaf value of a node, None for lists."""
+        kind = self.kinds[index]
+        return None if kind in (LIST, EMPTY) else self.symbols[kind]
+
+    def span(self, index):
+        """Token span of the innermost statement holding the node."""
+        owner = self.statement[index]
+        return self.span_starts[owner], self.span_ends[owner]
+
+    def first_child(self, index):
+        return index + 1 if self.kinds[index] == LIST else -1
+
+    def children(self, index):
+        child = self.first_child(index)
+        next_sibling = self.next_sibling
+        while child != -1:
+            yield child
+            child = next_sibling[child]
+
+    def child(self, index, n):
+        for i, child in enumerate(self.children(index)):
+            if i == n:
+                return child
+        raise IndexError("child index out of range")
+
+    def walk(self, index=0):
+        """Yields (node, depth) for the subtree of index in preorder."""
+        kinds, next_sibling = self.kinds, self.next_sibling
+        stack = [(index, 0)]
+        while stack:
+            node, depth = stack.pop()
+            yield node, depth
+            sibling = next_sibling[node]
+            if sibling != -1 and depth > 0:
+                stack.append((sibling, depth))
+            if kinds[node] == LIST:
+                stack.append((node + 1, depth + 1))
+
+    def to_list(self, index=0):
+        """The nested-list form parsing.Parser.parse_program returns."""
+        kinds, symbols = self.kinds, self.symbols
+        if kinds[index] not in (LIST, EMPTY):
+            return symbols[kinds[index]]
+        next_sibling = self.next_sibling
+        root = []
+        stack = [(index, root)]
+        while stack:
+            node, items = stack.pop()
+            child = node + 1 if kinds[node] == LIST else -1
+            while child != -1:
+                kind = kinds[child]
+                if kind == LIST or kind == EMPTY:
+                    sub = []
+                    items.append(sub)
+                    stack.append((child, sub))
+                else:
+                    items.append(symbols[kind])
+                child = next_sibling[child]
+        return root
@@ -1,16 +1,80 @@
+import io
+import itertools
 import re
+import sys
+
+import First2
+import follow
+from parsetree import ParseTree
 
 class ParseError(Exception):
-    pass
+    def __init__(self, message, index=None):
+        super().__init__(message)
+        self.index = index  # token position, set when the error is recorded
+
+# Panic-mode recovery skips to a token that can start a statement or close
+# a block, from the FIRST and FOLLOW sets of grammar.bnf; identifiers count
+# once declared. Built on first use, so importing parsing does not load the
+# grammar.
+_sync_tokens = None
+
+def get_sync_tokens():
+    global _sync_tokens
+    if _sync_tokens is None:
+        first, follow_sets = First2.get_first(), follow.get_follow()
+        statement_sync = first["<statement>"] | first["<block>"] | follow_sets["<statement>"]
+        _sync_tokens = {token for token in statement_sync if token.isalpha()} | first["<block>"] | {"}"}
+    return _sync_tokens
+
+# Binary operators by precedence, all left-associative
+PRECEDENCE = {
+    "or": 1,
+    "and": 2,
+    "<": 3, ">": 3, "==": 3, "<>": 3, "<=": 3, ">=": 3,
+    "+": 4, "-": 4,
+    "*": 5, "/": 5,
+}
+LOGIC_OPERATORS = {"and", "or"}
+COMPARISONS = {"<", ">", "==", "<>", "<=", ">="}
+
+# Sequence view of a token iterator, read only as far as the parser looks
+class TokenBuffer:
+    def __init__(self, tokens):
+        self.source = iter(tokens)
+        self.tokens = []
+        self.offset = 0  # index of self.tokens[0]
+
+    def __getitem__(self, i):
+        i -= self.offset
+        if i < 0:
+            raise IndexError("token was already discarded")
+        tokens = self.tokens
+        while i >= len(tokens):
+            token = next(self.source, None)
+            if token is None:
+                raise IndexError("token index out of range")
+            tokens.append(token)
+        return tokens[i]
+
+    def discard(self, index):
+        """Drops the tokens before index."""
+        del self.tokens[:index - self.offset]
+        self.offset = index
 
 class Parser:
     def __init__(self, tokens):
-        self.tokens = tokens
+        # A list is indexed directly, any other iterable is read as needed
+        self.tokens = tokens if isinstance(tokens, (list, tuple)) else TokenBuffer(tokens)
         self.current = 0
-        self.ids = []
+        self.ids = set()
+        self.spans = None  # id() of each statement -> token span, while parse_arena runs
+        self.errors = None  # ParseErrors, while parse_program(recover=True) runs
     
     def peek(self):
-        return self.tokens[self.current] if self.current < len(self.tokens) else None
+        try:
+            return self.tokens[self.current]
+        except IndexError:
+            return None
     
     def advance(self):
         self.current += 1
@@ -32,17 +96,105 @@ class Parser:
             else:
                 self.retreat()
         return None
+
+    def expect(self, *expected):
+        """match() that records a diagnostic for a missing token when recovering."""
+        token = self.match(*expected)
+        if token is None and self.errors is not None:
+            found = self.peek()
+            self.errors.append(ParseError(f"Expected {' or '.join(expected)}, found {found if found is not None else 'end of input'}",
+                                          self.current))
+        return token
     
-    def parse_program(self):
-        return ["<program>", self.parse_statements()]
+    def parse_program(self, recover=False):
+        """Returns the parse tree, or (tree, errors) with recover=True.
+
+        With recover=True a syntax error does not end the parse. It is
+        recorded, tokens are skipped up to one in get_sync_tokens() and parsing
+        goes on; the statement becomes an <error> node with the skipped
+        tokens. Missing tokens that parsing can do without are reported too.
+        """
+        if not recover:
+            return ["<program>", self.parse_statements()]
+        self.errors = []
+        try:
+            tree = ["<program>", self.parse_statements()]
+        finally:
+            errors, self.errors = self.errors, None
+        return tree, errors
+
+    def synchronize(self, start):
+        """Skips to the next token in get_sync_tokens(), always past start."""
+        if self.current == start:
+            self.advance()
+        sync_tokens = get_sync_tokens()
+        token = self.peek()
+        while token is not None and token not in sync_tokens and not (token in self.ids and token.isidentifier()):
+            self.advance()
+            token = self.peek()
+
+    def parse_recovering_statement(self):
+        """parse_statement, with panic-mode recovery while errors are collected."""
+        if self.errors is None:
+            return self.parse_statement()
+        start = self.current
+        try:
+            return self.parse_statement()
+        except ParseError as error:
+            if error.index is None:
+                error.index = self.current
+            # A missing token already reported here is the same error
+            if not self.errors or self.errors[-1].index != error.index:
+                self.errors.append(error)
+            self.synchronize(start)
+            return ["<error>", [self.tokens[i] for i in range(start, self.current)]]
+
+    def parse_arena(self):
+        """Parses like parse_program, into a parsetree.ParseTree.
+
+        Each top-level statement goes into the arena as soon as it is parsed,
+        so only one statement exists as nested lists at a time. to_list()
+        on the result gives what parse_program returns.
+        """
+        tree = ParseTree()
+        tree.add(["<program>", ["<statement>*", []]])
+        statements = tree.child(tree.child(0, 1), 1)
+        previous = -1
+        self.spans = {}
+        try:
+            for statement in self.iter_statements():
+                child = tree.add(statement, spans=self.spans)
+                tree.attach(statements, previous, child)
+                previous = child
+                self.spans.clear()
+        finally:
+            self.spans = None
+        tree.span_ends[0] = self.current
+        return tree
+
+    def iter_statements(self):
+        """Yields each top-level statement as soon as it is parsed.
+
+        When the parser reads from an iterator, tokens are dropped once their
+        statement is done, so memory does not grow with the program.
+        """
+        while self.peek() is not None:
+            statement = self.parse_recovering_statement()
+            if isinstance(self.tokens, TokenBuffer):
+                self.tokens.discard(self.current)
+            yield statement
     
     def parse_statements(self):
-        statements = []
-        while self.peek() is not None:
-            statements.append(self.parse_statement())
-        return ["<statement>*", statements]
+        return ["<statement>*", list(self.iter_statements())]
     
     def parse_statement(self):
+        start = self.current
+        statement = self.parse_statement_kind()
+        if self.spans is not None:
+            self.spans[id(statement)] = (start, self.current)
+        return statement
+
+    def parse_statement_kind(self):
         token = self.peek()
         
         if token in {"int", "float", "string"}:  # Declaration
@@ -69,7 +221,7 @@ class Parser:
     def parse_declaration(self):
         datatype = self.match("int", "float", "string")
         identifier = self.parse_identifier()
-        self.match("=")
+        self.expect("=")
         expression = self.parse_expression()  # Call to parse_expression
         self.match(";")
         return ["<declaration>", [
@@ -84,7 +236,7 @@ class Parser:
     
     def parse_assignment(self):
         identifier = self.parse_identifier()
-        self.match("=")
+        self.expect("=")
         expression = self.parse_expression()  # Call to parse_expression
         self.match(";")
         return ["<assignment>", [
@@ -98,8 +250,9 @@ class Parser:
     
     def parse_identifier(self):
         token = self.peek()
-        if token not in self.ids:
-            self.ids.append(token)
+        if token is None:
+            raise ParseError("Unexpected end of input, expected an identifier")
+        self.ids.add(token)
         # Use a regex pattern to validate if the token is a valid identifier
         if re.match(r'^[_a-zA-Z][_a-zA-Z0-9]*$', token):
             self.current += 1  # Move to the next token
@@ -107,11 +260,53 @@ class Parser:
         raise ParseError(f"Invalid identifier: {token}")
     
     def parse_expression(self):
-        # First, parse the primary expression (identifier, number, string)
-        primary_expr = self.parse_primary_expression()
-
-        # Now, handle the tail of the expression (operators, logical operations)
-        return self.parse_expression_tail(primary_expr)
+        # Precedence climbing with explicit operand and operator stacks, so
+        # long operator chains need no recursion. Equal precedence reduces
+        # first, which keeps the stacks as short as the precedence table.
+        operands = [self.parse_primary_expression()]
+        operators = []
+        while True:
+            operator = self.peek_operator()
+            if operator is None:
+                break
+            precedence = PRECEDENCE[operator]
+            while operators and PRECEDENCE[operators[-1]] >= precedence:
+                self.reduce_expression(operands, operators)
+            self.current += len(self.split_operator(operator))
+            operators.append(operator)
+            operands.append(self.parse_primary_expression())
+        while operators:
+            self.reduce_expression(operands, operators)
+        return operands[0]
+
+    @staticmethod
+    def split_operator(operator):
+        """Tokens of an operator: tokenize splits '<=' into '<' and '='."""
+        return [operator] if operator[0].isalpha() else list(operator)
+
+    def peek_operator(self):
+        """Binary operator at the current token, or None."""
+        token = self.peek()
+        if token in ("<", ">", "="):
+            self.advance()
+            next_token = self.peek()
+            self.retreat()
+            if next_token == "=" or (token == "<" and next_token == ">"):
+                return token + next_token
+            return token if token != "=" else None
+        return token if token in PRECEDENCE else None
+
+    @staticmethod
+    def reduce_expression(operands, operators):
+        operator = operators.pop()
+        right = operands.pop()
+        left = operands.pop()
+        if operator in LOGIC_OPERATORS:
+            operands.append(["<expression>", [left, "<logicOp>", operator, right]])
+        elif operator in COMPARISONS:
+            operands.append(["<expression>", [left, "<compOp>", [operator], right]])
+        else:
+            operands.append(["<expression>", [left, "<operator>", operator, right]])
 
     def parse_primary_expression(self):
         token = self.peek()
@@ -145,6 +340,9 @@ class Parser:
                     ["<number>", ["<digit>", current_number]],
                 ]
 
+        elif token is None:
+            raise ParseError("Unexpected end of input, expected an expression")
+
         # Handle string (e.g., "hello")
         elif token.startswith('"') and token.endswith('"'):
             text = self.match(token)
@@ -157,7 +355,7 @@ class Parser:
             # Check if it's followed by a single operator (e.g., ++, --)
             next_token = self.peek()
             self.advance()
-            whole = next_token + self.peek()
+            whole = (next_token or "") + (self.peek() or "")
             if whole in ["++", "--"]:
                 single_op = self.match(next_token)
                 return ["<primary_expression>", ["<identifier>", identifier, "<singleOp>", [whole]]]
@@ -168,26 +366,6 @@ class Parser:
         else:
             raise ParseError(f"Invalid primary expression: {token}")
 
-    def parse_expression_tail(self, left_expr):
-        token = self.peek()
-
-        # Handle arithmetic operations (e.g., x + 2)
-        if token in ["+", "-", "*", "/"]:
-            operator = self.match(token)
-            right_expr = self.parse_primary_expression()  # Parse the right side of the operation
-            # Recursively process further arithmetic operations
-            return self.parse_expression_tail(["<expression>", [left_expr, "<operator>", operator, right_expr]])
-
-        # Handle logical operations (e.g., "and", "or")
-        elif token in ["and", "or"]:
-            logic_op = self.match(token)
-            right_expr = self.parse_expression()  # Parse the second expression
-            return ["<expression>", [left_expr, "<logicOp>", logic_op, right_expr]]
-
-        # No further expressions (base case)
-        else:
-            return left_expr
-    
     def parse_if_condition(self):
         self.match("if")
         condition = self.parse_condition()
@@ -198,36 +376,41 @@ class Parser:
         return ["<if-condition>", ["if", condition, block]]
     
     def parse_condition(self):
-        left = self.parse_expression()  # Expression on the left side of comparison
-        comp_op = self.match(">", "<", "==", "<>", ">=", "<=")
-        if not comp_op:
-            raise ParseError("Invalid condition operator.")
-        right = self.parse_expression()  # Expression on the right side of comparison
-        return ["<condition>", [left, "<compOp>", [comp_op], right]]
+        # A comparison, or comparisons joined by and/or
+        expression = self.parse_expression()
+        pending = [expression]
+        while pending:  # every operand of and/or must itself be a comparison
+            node = pending.pop()
+            if node[0] != "<expression>" or node[1][1] not in ("<compOp>", "<logicOp>"):
+                raise ParseError("Invalid condition operator.")
+            if node[1][1] == "<logicOp>":
+                pending.append(node[1][0])
+                pending.append(node[1][3])
+        return ["<condition>", expression[1]]
     
     def parse_for(self):
         self.match("for")  # Match the 'for' keyword
 
         # Expect '(' after 'for'
-        self.match("(")
+        self.expect("(")
 
         # Parse the variable declaration
         var_declaration = self.parse_declaration()
 
         # Expect ';' after the variable declaration
-        self.match(",")
+        self.expect(",")
 
         # Parse the condition part of the loop
         condition = self.parse_condition()
 
         # Expect ';' after the condition
-        self.match(",")
+        self.expect(",")
 
         # Parse the expression part of the loop
         expression = self.parse_expression()
 
         # Expect ')' after the expression
-        self.match(")")
+        self.expect(")")
 
         # Parse the block of statements inside the loop
         block = self.parse_block()
@@ -240,12 +423,12 @@ class Parser:
         identifier = self.parse_identifier()  # Parse the function identifier
         
         # Expect opening parenthesis for parameters
-        self.match("(")
+        self.expect("(")
         
         parameters = []
         # Parse parameters (datatype identifier separator)*, stop at closing parenthesis
         while self.peek() not in [")", None]:
-            datatype = self.match("int", "float", "string")  # Match datatype (int, float, string)
+            datatype = self.expect("int", "float", "string")  # Match datatype (int, float, string)
             identifier_param = self.parse_identifier()  # Parse the identifier (parameter name)
             parameters.append(["<parameter>", [datatype, identifier_param]])
 
@@ -254,7 +437,7 @@ class Parser:
                 self.match(",")
         
         # Expect closing parenthesis after parameters
-        self.match(")")
+        self.expect(")")
         
         # Parse the block of statements
         block = self.parse_block()
@@ -278,7 +461,7 @@ class Parser:
     def parse_call(self):
         self.match("call")  # Match the "call" keyword
         function_name = self.parse_identifier()  # Parse the function name (an <identifier>)
-        self.match("(")  # Match the opening parenthesis
+        self.expect("(")  # Match the opening parenthesis
 
         # Parse zero or more <identifier>s separated by commas
         arguments = []
@@ -291,14 +474,14 @@ class Parser:
                 self.match(",")
         
         # Expect closing parenthesis after parameters
-        self.match(")")
+        self.expect(")")
 
         return ["<call>", ["call", function_name, "(", arguments, ")", ";"]]
 
 
     def parse_block(self):
         # Start of block: '{'
-        self.match("{")
+        self.expect("{")
         
         statements = []
         while True:
@@ -309,16 +492,19 @@ class Parser:
                 self.match("}")  # Accept the closing brace
                 break
             elif token == None:
-                raise ParseError("Unbalanced Code: missing }")
+                if self.errors is None:
+                    raise ParseError("Unbalanced Code: missing }")
+                self.errors.append(ParseError("Unbalanced Code: missing }", self.current))
+                break
             # Parse individual statements
-            statements.append(self.parse_statement())
+            statements.append(self.parse_recovering_statement())
             
         return ["<block>", statements]
 
 
     def parse_print(self):
         self.match("print")
-        self.match("(")
+        self.expect("(")
 
         # Check for <call> or <expression>
         if self.peek() == "call":  # Assuming `current_token` points to the current token
@@ -334,38 +520,115 @@ class Parser:
         return ["<print>", ["print", "(", content, ")", ";"]]
 
 
+TOKEN_PATTERN = re.compile(r'[a-zA-Z_][a-zA-Z0-9_]*|[{}();=<>]|"[^"]*"|\d+|\S')
+
 def tokenize(code):
-    tokens = re.findall(r'[a-zA-Z_][a-zA-Z0-9_]*|[{}();=<>]|"[^"]*"|\d+|\S', code)
+    tokens = TOKEN_PATTERN.findall(code)
     return tokens
 
-def pretty_print(tree, level=0, prefix="└──"):
-    """Pretty prints the parse tree with indentation and tree-like symbols."""
-    if isinstance(tree, list):
-        # If the tree is a list, it represents a branch. We need to handle it differently.
-        result = ""
-        for idx, item in enumerate(tree):
-            # Use '├──' for intermediate branches and '└──' for the last branch.
-            child_prefix = "├──" if idx < len(tree) - 1 else "└──"
-            result += pretty_print(item, level + 1, child_prefix)
-        return result
+# Tree printing
+# Lines are written with an explicit stack, one entry per level, and handed
+# to the stream a chunk at a time, so neither deep nor long trees build the
+# whole text in memory.
+FLUSH_LINES = 4096
+BRANCH, LAST = "├──", "└──"
+
+def write_tree(tree, stream, max_depth=None, path=(), level=0, prefix=LAST):
+    """Writes the lines of pretty_print(tree) to stream.
+
+    tree is the list form or a ParseTree. path selects a subtree, as a
+    sequence of child positions. Lines deeper than max_depth are left out
+    and a "..." line marks each list that was cut.
+    """
+    lines = []
+    if isinstance(tree, ParseTree):
+        node = 0
+        for index in path:
+            node = tree.child(node, index)
+        _write_arena(tree, node, stream, max_depth, level, prefix, lines)
     else:
-        # For leaf nodes (strings or tokens), print with indentation and arrow for values.
-        if isinstance(tree, str) and "->" not in tree:
-            return f"{'│   ' * level}{prefix} {tree}\n"
-        elif isinstance(tree, str):
-            # Handle the token with an arrow (e.g., "-> 'x'")
-            return f"{'│   ' * level}{prefix} {tree}\n"
+        for index in path:
+            tree = tree[index]
+        _write_lists(tree, stream, max_depth, level, prefix, lines)
+    stream.write("".join(lines))
+
+def _write_lists(tree, stream, max_depth, level, prefix, lines):
+    if not isinstance(tree, list):
+        lines.append(f"{'│   ' * level}{prefix} {tree}\n")
+        return
+    stack = [(tree, 0, level + 1)]  # (list, next item, level of its items)
+    while stack:
+        items, index, level = stack[-1]
+        if index == len(items):
+            stack.pop()
+            continue
+        stack[-1] = (items, index + 1, level)
+        if max_depth is not None and level > max_depth:
+            lines.append(f"{'│   ' * level}{LAST} ...\n")
+            stack.pop()
+            continue
+        item = items[index]
+        if isinstance(item, list):
+            stack.append((item, 0, level + 1))
         else:
-            return f"{'│   ' * level}{prefix} {tree}\n"
+            prefix = BRANCH if index < len(items) - 1 else LAST
+            lines.append(f"{'│   ' * level}{prefix} {item}\n")
+            if len(lines) >= FLUSH_LINES:
+                stream.write("".join(lines))
+                lines.clear()
+
+def _write_arena(tree, node, stream, max_depth, level, prefix, lines):
+    if not tree.is_list(node):
+        lines.append(f"{'│   ' * level}{prefix} {tree.value(node)}\n")
+        return
+    next_sibling, symbols, kinds = tree.next_sibling, tree.symbols, tree.kinds
+    stack = [(tree.first_child(node), level + 1)]  # (next child, its level)
+    while stack:
+        child, level = stack[-1]
+        if child == -1:
+            stack.pop()
+            continue
+        sibling = next_sibling[child]
+        stack[-1] = (sibling, level)
+        if max_depth is not None and level > max_depth:
+            lines.append(f"{'│   ' * level}{LAST} ...\n")
+            stack.pop()
+            continue
+        if tree.is_list(child):
+            stack.append((tree.first_child(child), level + 1))
+        else:
+            prefix = BRANCH if sibling != -1 else LAST
+            lines.append(f"{'│   ' * level}{prefix} {symbols[kinds[child]]}\n")
+            if len(lines) >= FLUSH_LINES:
+                stream.write("".join(lines))
+                lines.clear()
+
+def write_program(statements, stream, max_depth=None):
+    """Writes pretty_print of a program from its statements, e.g. Parser.iter_statements().
+
+    Each statement is printed and dropped before the next one is read.
+    """
+    if max_depth is not None and max_depth < 3:
+        # Statements are cut; whether there is one decides if "..." shows
+        write_tree(["<program>", ["<statement>*", list(itertools.islice(statements, 1))]], stream, max_depth)
+        return
+    stream.write(f"│   {BRANCH} <program>\n│   │   {BRANCH} <statement>*\n")
+    for statement in statements:
+        write_tree(statement, stream, max_depth, level=3)
+
+def pretty_print(tree, level=0, prefix="└──"):
+    """Pretty prints the parse tree with indentation and tree-like symbols."""
+    buffer = io.StringIO()
+    write_tree(tree, buffer, level=level, prefix=prefix)
+    return buffer.getvalue()
 
 if __name__ == "__main__":
-    with open("code.txt", "r") as f:
-        code = f.read()
-    tokens = tokenize(code)
+    import pipeline  # Loads this file again as the parsing module
     try:
-        parser = Parser(tokens)
-        parse_tree = parser.parse_program()  # Call to parse_program to start parsing
+        # Parsed once and then read from the on-disk cache while code.txt is unchanged
+        parse_tree = pipeline.load("code.txt").parse_arena()
         print("Parse Tree:")
-        print(pretty_print(parse_tree))  # Use pretty_print for formatted output
-    except ParseError as e:
+        write_tree(parse_tree, sys.stdout)  # Same lines as pretty_print
+        print()
+    except pipeline.parsing.ParseError as e:
         print(f"Syntax error: '{e}'")
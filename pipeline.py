@@ -0,0 +1,235 @@
+# pipeline.py
+# Lex a source once and share the result. The token list, the FIRST/FOLLOW
+# reports, the parse tree and the symbol table all come from the same
+# TokenStream, and each one is built the first time it is asked for. With a
+# cache.DiskCache the tokens and the parse tree are also kept on disk.
+#
+# The parser sees the tokens of the lexer, not those of parsing.tokenize:
+# comments and ';' are skipped by the lexer and never reach it. Every source
+# tokenize's tokens parse gets the same tree here, but sources with comments,
+# or with a ';' the grammar has no place for (a lone ';', one after '}'), now
+# parse too where parsing the tokenize tokens raised ParseError. That holds
+# for display.py, myShell.py, parsing.py's __main__, stream_parser_tokens and
+# the trees kept in the cache.
+import os
+
+import cache
+import First2
+import follow
+import parsing
+import Table
+from basic import TokenKind, CATEGORIES, CHUNK_SIZE, lexeme_kind, stream_chunks
+from tokenstream import TokenStream, stream_lexer
+
+# Kinds whose lexeme is already one token for parsing.Parser
+PARSER_DIRECT = {
+    TokenKind.INT, TokenKind.DATATYPE, TokenKind.KEYWORD, TokenKind.PLUS,
+    TokenKind.MINUS, TokenKind.MUL, TokenKind.DIV, TokenKind.LPAREN,
+    TokenKind.LSQUARE, TokenKind.RPAREN, TokenKind.RSQUARE, TokenKind.RBRACE,
+    TokenKind.LBRACE, TokenKind.AND, TokenKind.OR, TokenKind.NOT,
+    TokenKind.LESS, TokenKind.GREATER, TokenKind.SEPARATOR, TokenKind.ASSIGN,
+}
+
+def parser_tokens(stream):
+    """Splits a TokenStream into tokens for parsing.Parser.
+
+    These are the tokens parsing.tokenize would produce, minus the ';' and
+    comment tokens, which the lexer skips (see the note at the top). Most
+    lexemes map straight across; floats, '++' and the like are split the way
+    tokenize splits them. A lexeme holding a stray '"' (the lexer
+    reads '="' as one comparison) is re-split from there with
+    parsing.TOKEN_PATTERN until its tokens line up with the lexer's again.
+    """
+    tokens = []
+    split_tokens(stream, tokens)
+    return tokens
+
+def split_tokens(stream, tokens, final=True, sources=None):
+    """Appends the parser_tokens of stream to tokens.
+
+    Returns the index of the first token left unsplit: len(stream), unless
+    final is False and a re-split ran to the end of stream.text, where the
+    text that follows could still change it. If sources is a list, the
+    index of the stream token each parser token was split from goes there
+    too; a re-split run counts as split from the token it started at.
+    """
+    text = stream.text
+    kinds, starts, ends = stream.kinds, stream.starts, stream.ends
+    count = len(kinds)
+    append = tokens.append
+    i = 0
+
+    while i < count:
+        kind = kinds[i]
+        lexeme = text[starts[i]:ends[i]]
+        i += 1
+        if kind in PARSER_DIRECT or (kind == TokenKind.IDENTIFIER and lexeme.isascii() and lexeme.isidentifier()):
+            append(lexeme)
+            if sources is not None:
+                sources.append(i - 1)
+        elif '"' not in lexeme or (kind == TokenKind.STRING and lexeme[0] == '"'):
+            split = parsing.tokenize(lexeme)
+            tokens.extend(split)
+            if sources is not None:
+                sources.extend([i - 1] * len(split))
+        else:
+            first, mark = i - 1, len(tokens)
+            for match in parsing.TOKEN_PATTERN.finditer(text, starts[first]):
+                token = match.group()
+                end = match.end()
+                # A lone '"' (no closing quote yet) or a match touching the
+                # end of the text may read differently once more text follows
+                if not final and (token == '"' or end == len(text)):
+                    del tokens[mark:]
+                    if sources is not None:
+                        del sources[mark:]
+                    return first
+                append(token)
+                if sources is not None:
+                    sources.append(first)
+                while i < count and ends[i] <= end:
+                    i += 1
+                if ends[i - 1] == end:
+                    break
+            else:
+                if not final:
+                    del tokens[mark:]
+                    if sources is not None:
+                        del sources[mark:]
+                    return first
+                i = count
+    return count
+
+def stream_parser_tokens(file_obj, fname='<stream>', chunk_size=CHUNK_SIZE):
+    """Yields parser_tokens while file_obj is read chunk by chunk.
+
+    Raises basic.LexError on the first lexing error.
+    """
+    carry_text, carry_spans = '', []  # tokens split_tokens left for the next chunk
+    for text, _, spans in stream_chunks(fname, file_obj, chunk_size):
+        if carry_spans:
+            shift = len(carry_text)
+            spans = carry_spans + [(start + shift, end + shift) for start, end in spans]
+            text = carry_text + text
+        stream = TokenStream(text)
+        for start, end in spans:
+            stream.append(lexeme_kind(text[start:end]), start, end)
+        tokens = []
+        done = split_tokens(stream, tokens, final=False)
+        yield from tokens
+        carry_text, carry_spans = '', []
+        if done < len(spans):
+            base = spans[done][0]
+            carry_text = text[base:]
+            carry_spans = [(start - base, end - base) for start, end in spans[done:]]
+    if carry_spans:
+        stream = TokenStream(carry_text)
+        for start, end in carry_spans:
+            stream.append(lexeme_kind(carry_text[start:end]), start, end)
+        yield from parser_tokens(stream)
+
+def iter_statements(file_obj, fname='<stream>', chunk_size=CHUNK_SIZE):
+    """Parses file_obj one top-level statement at a time, see Parser.iter_statements."""
+    return parsing.Parser(stream_parser_tokens(file_obj, fname, chunk_size)).iter_statements()
+
+class Pipeline:
+    def __init__(self, fname, text, cache=None):
+        self.fname = fname
+        self.text = text
+        self.cache = cache
+        self._parse_tree = None
+        self._parse_arena = None
+        self._parse_error = None  # message and index of a ParseError read from the cache
+        self._symbol_table = None
+        self._token_types = None
+        entry = cache.get(text) if cache is not None else None
+        if entry is not None:
+            self.stream, self.error = entry.stream, None
+            if entry.parse_error is not None:
+                self._parse_error = (entry.parse_error, entry.error_index)
+            self._parse_arena = entry.tree
+        else:
+            # Written to the cache once parse_arena has parsed it
+            self.stream, self.error = stream_lexer(fname, text).make_tokens()
+
+    @classmethod
+    def from_file(cls, path, cache=None):
+        with open(path, 'r') as file:
+            text = file.read()
+        return cls(f'<{os.path.basename(path)}>', text, cache)
+
+    @property
+    def tokens(self):
+        """Token tuples, as runner.run returns them."""
+        return self.stream
+
+    def token_types(self):
+        """Token types in order of first appearance."""
+        if self._token_types is None:
+            kinds = self.stream.kinds if not self.error else []
+            types = {}
+            for kind in dict.fromkeys(kinds):
+                types.setdefault(CATEGORIES[kind])
+            self._token_types = list(types)
+        return self._token_types
+
+    def first_sets(self):
+        return [(token_type, First2.FIRST.get(token_type, [token_type])) for token_type in self.token_types()]
+
+    def follow_sets(self):
+        return [(token_type, follow.FOLLOW.get(token_type, [token_type])) for token_type in self.token_types()]
+
+    def parser_tokens(self):
+        if self.error:  # Nothing was lexed, parse the raw text as before
+            return parsing.tokenize(self.text)
+        return parser_tokens(self.stream)
+
+    def parse_tree(self):
+        """Parse tree of parsing.Parser, raises parsing.ParseError."""
+        if self._parse_tree is None:
+            if self.cache is None and self._parse_arena is None:
+                self._parse_tree = parsing.Parser(self.parser_tokens()).parse_program()
+            else:
+                self._parse_tree = self.parse_arena().to_list()
+        return self._parse_tree
+
+    def parse_arena(self):
+        """Parse tree as a parsetree.ParseTree, raises parsing.ParseError.
+
+        This is the form the cache stores, so it loads without building
+        the nested lists.
+        """
+        if self._parse_error is not None:
+            raise parsing.ParseError(*self._parse_error)
+        if self._parse_arena is None:
+            try:
+                self._parse_arena = parsing.Parser(self.parser_tokens()).parse_arena()
+            except parsing.ParseError as error:
+                if self.cache is not None and not self.error:
+                    self.cache.put(self.text, self.stream, parse_error=str(error), error_index=error.index)
+                raise
+            if self.cache is not None and not self.error:
+                self.cache.put(self.text, self.stream, self._parse_arena)
+        return self._parse_arena
+
+    def symbol_table(self):
+        if self._symbol_table is None:
+            if self.error:
+                self._symbol_table = Table.parse_code(self.text)
+            else:
+                self._symbol_table = Table.parse_tokens(self.stream)
+        return self._symbol_table
+
+# Pipeline of the last file loaded, reused until that file changes on disk.
+# Only one is kept, so loading many files does not keep them all alive.
+# Across runs, cache.default_cache() keeps the tokens and tree of unchanged
+# sources.
+_loaded = None
+
+def load(path):
+    global _loaded
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if _loaded is None or _loaded[0] != key:
+        _loaded = (key, Pipeline.from_file(path, cache.default_cache()))
+    return _loaded[1]
@@ -0,0 +1,140 @@
+# predictive.py
+# Table-driven LL(1) parser. The table (nonterminal x terminal -> production)
+# comes from the compiled parser.bnf (see grammarc.py) and the parse runs on
+# an explicit stack: no recursion, no backtracking, one table lookup per
+# token.
+import re
+
+import grammarc
+from analysis import END
+from First2 import epsilon
+from grammarc import GrammarError
+from parsing import ParseError
+
+class LL1Table:
+    """Parse table of a grammarc.CompiledGrammar, raises GrammarError on conflicts."""
+    def __init__(self, compiled):
+        if compiled.conflicts:
+            nonterminal, terminal, productions = compiled.conflicts[0]
+            raise GrammarError(f"LL(1) conflict in {nonterminal} on {terminal!r}: "
+                               + " / ".join(' '.join(compiled.productions[production][1]) or epsilon
+                                            for production in productions))
+        self.compiled = compiled
+        self.start = compiled.start
+        # Production number -> symbol list; the table entries are these lists
+        bodies = [list(body) for _, body in compiled.productions]
+        self.productions = {nonterminal: [bodies[number] for number in numbers]
+                            for nonterminal, numbers in compiled.alternatives.items()}
+        self.nonterminals = set(compiled.nonterminals)
+        self.terminals = set(compiled.terminals) - {epsilon, END}
+        self.first = compiled.first_sets()
+        self.follow = compiled.follow_sets()
+        self.table = {nonterminal: {terminal: bodies[number] for terminal, number in row.items()}
+                      for nonterminal, row in compiled.table.items()}
+
+    @classmethod
+    def from_grammar(cls, grammar, start):
+        """Table of a grammar given as nonterminal -> production strings, epsilon for an empty one."""
+        productions = {nonterminal: [cls.symbols(production) for production in productions]
+                       for nonterminal, productions in grammar.items()}
+        return cls(grammarc.CompiledGrammar(grammarc.compile_grammar(productions, start)))
+
+    @staticmethod
+    def symbols(production):
+        return () if production == epsilon else tuple(production.split())
+
+    def first_of(self, symbols):
+        """FIRST of a symbol sequence, with epsilon if all of it can be empty."""
+        return self.compiled.first_of(symbols)
+
+# Built on first use
+_table = None
+
+def get_table():
+    global _table
+    if _table is None:
+        _table = LL1Table(grammarc.load(grammarc.PARSER))
+    return _table
+
+IDENTIFIER = re.compile(r'[_a-zA-Z][_a-zA-Z0-9]*\Z')
+# Terminals of parser.bnf that stand for a class of tokens, not for themselves
+PLACEHOLDERS = {"id", "num", "str"}
+
+class TerminalTable(dict):
+    """Maps each distinct parser token to the grammar terminal it stands for.
+
+    Keywords and punctuation are terminals of their own; any other token is
+    classified by its shape, so an identifier spelled num is still an id.
+    """
+    def __init__(self, terminals):
+        super().__init__((terminal, terminal) for terminal in terminals if terminal not in PLACEHOLDERS)
+        self[None] = END
+
+    def __missing__(self, token):
+        if token[0] == '"':
+            terminal = "str"
+        elif token.isdigit():
+            terminal = "num"
+        elif IDENTIFIER.match(token):
+            terminal = "id"
+        else:
+            terminal = token
+        self[token] = terminal
+        return terminal
+
+class PredictiveParser:
+    def __init__(self, tokens, table=None):
+        self.tokens = tokens
+        self.table = table or get_table()
+
+    def parse_program(self):
+        """Returns the parse tree as [nonterminal, children] lists, tokens as leaves."""
+        table = self.table.table
+        nonterminals, terminals = self.table.nonterminals, self.table.terminals
+        terminal_of = TerminalTable(terminals)
+        tokens = iter(self.tokens)
+        token = next(tokens, None)
+        lookahead = terminal_of[token]
+
+        top = [None]
+        # Entries are (symbol, children list of its parent, index in that list)
+        stack = [(END, None, 0), (self.table.start, top, 0)]
+        while stack:
+            symbol, children, index = stack.pop()
+            if symbol in nonterminals:
+                production = table[symbol].get(lookahead)
+                if production is None:
+                    if token is None:
+                        raise ParseError(f"Unexpected end of input in {symbol}")
+                    raise ParseError(f"Unexpected input: {token}")
+                node_children = [None] * len(production)
+                children[index] = [symbol, node_children]
+                for i in range(len(production) - 1, -1, -1):
+                    stack.append((production[i], node_children, i))
+            elif symbol == lookahead:
+                if symbol == END:
+                    return top[0]
+                children[index] = token
+                token = next(tokens, None)
+                lookahead = terminal_of[token]
+            elif token is None:
+                raise ParseError(f"Unexpected end of input, expected {symbol}")
+            else:
+                raise ParseError(f"Unexpected input: {token}, expected {symbol}")
+        return top[0]
+
+def check():
+    """Parses programs that parsing.Parser accepts; raises ParseError if one fails."""
+    import parsing
+    programs = [
+        "int num = 5", "int str = 5", "int id = 5",  # placeholder terminals as names
+        "string s = \"num\" int x = num + str * id print(x)",
+    ]
+    for program in programs:
+        tokens = parsing.tokenize(program)
+        parsing.Parser(tokens).parse_program()
+        PredictiveParser(tokens).parse_program()
+
+if __name__ == "__main__":
+    check()
+    print("ok")
@@ -0,0 +1,161 @@
+# ruleprofile.py
+# Per-rule profile of parsing.Parser: calls, time, tokens consumed and
+# retreats (one-token backtracks) for every parse_* method.
+#
+#   python ruleprofile.py code.txt
+#   python ruleprofile.py code.txt --json profile.json --folded profile.folded
+#
+# Nothing in parsing.Parser changes. ParserProfile.attach wraps the parse_*
+# methods of one parser object, so parsers that are not profiled run the
+# plain methods. The folded output has one "rule;rule;rule microseconds" line
+# per call stack, the input of flamegraph.pl, speedscope and similar tools.
+import argparse
+import contextlib
+import heapq
+import json
+import sys
+import time
+
+import parsing
+import pipeline
+
+SLOWEST = 20   # calls kept in ParserProfile.slowest
+
+class RuleStats:
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0       # including nested rules, recursion counted once
+        self.self_seconds = 0.0  # excluding nested rules
+        self.tokens = 0          # consumed, recursion counted once
+        self.retreats = 0
+
+    def as_dict(self):
+        return {"calls": self.calls, "seconds": self.seconds, "self_seconds": self.self_seconds,
+                "tokens": self.tokens, "retreats": self.retreats}
+
+class ParserProfile:
+    def __init__(self):
+        self.rules = {}
+        self.stacks = {}    # tuple of rule names -> self seconds
+        self.slowest = []   # heap of (seconds, rule, first token, end token)
+        self.frames = []    # [stack, seconds in nested rules] per active call
+        self.active = {}    # rule -> active calls, to count recursion once
+
+    def attach(self, parser):
+        """Profiles every parse_* call and retreat of parser, returns parser."""
+        for name in dir(type(parser)):
+            if name.startswith("parse_") and callable(getattr(type(parser), name)):
+                setattr(parser, name, self.wrap(parser, name, getattr(parser, name)))
+        retreat = parser.retreat
+        rules, frames = self.rules, self.frames
+
+        def counted_retreat():
+            if frames:
+                rules[frames[-1][0][-1]].retreats += 1
+            retreat()
+        parser.retreat = counted_retreat
+        return parser
+
+    def wrap(self, parser, name, method):
+        stats = self.rules.setdefault(name, RuleStats(name))
+        frames, active, stacks, slowest = self.frames, self.active, self.stacks, self.slowest
+        clock = time.perf_counter
+
+        def rule(*args, **kwargs):
+            stack = (frames[-1][0] if frames else ()) + (name,)
+            frame = [stack, 0.0]
+            frames.append(frame)
+            outermost = not active.get(name)
+            active[name] = active.get(name, 0) + 1
+            first = parser.current
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                frames.pop()
+                active[name] -= 1
+                own = elapsed - frame[1]
+                stats.calls += 1
+                stats.self_seconds += own
+                stacks[stack] = stacks.get(stack, 0.0) + own
+                if outermost:
+                    stats.seconds += elapsed
+                    stats.tokens += parser.current - first
+                    entry = (elapsed, name, first, parser.current)
+                    if len(slowest) < SLOWEST:
+                        heapq.heappush(slowest, entry)
+                    elif entry > slowest[0]:
+                        heapq.heapreplace(slowest, entry)
+                if frames:
+                    frames[-1][1] += elapsed
+        return rule
+
+    def to_json(self):
+        """Profile as a JSON-ready dict."""
+        return {
+            "rules": {name: stats.as_dict() for name, stats in sorted(self.rules.items()) if stats.calls},
+            "slowest": [{"rule": name, "seconds": seconds, "tokens": [first, end]}
+                        for seconds, name, first, end in sorted(self.slowest, reverse=True)],
+        }
+
+    def folded(self):
+        """Collapsed stack lines for flame graph tools, self time in microseconds."""
+        return [f"{';'.join(stack)} {round(seconds * 1e6)}"
+                for stack, seconds in sorted(self.stacks.items()) if round(seconds * 1e6)]
+
+    def report(self, top=None):
+        """Text table of the rules, most self time first."""
+        rules = sorted((stats for stats in self.rules.values() if stats.calls),
+                       key=lambda stats: stats.self_seconds, reverse=True)[:top]
+        lines = [f"{'rule':<28}{'calls':>10}{'self s':>11}{'total s':>11}{'tokens':>10}{'retreats':>10}"]
+        for stats in rules:
+            lines.append(f"{stats.name:<28}{stats.calls:>10}{stats.self_seconds:>11.4f}{stats.seconds:>11.4f}"
+                         f"{stats.tokens:>10}{stats.retreats:>10}")
+        return "\n".join(lines)
+
+def profile_parse(tokens, recover=False):
+    """Runs Parser(tokens).parse_program(recover) under a profile.
+
+    Returns (result, profile); result is None if a ParseError ended the parse.
+    """
+    profile = ParserProfile()
+    parser = profile.attach(parsing.Parser(tokens))
+    try:
+        result = parser.parse_program(recover)
+    except parsing.ParseError:
+        result = None
+    return result, profile
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Profile parsing.Parser rule by rule on a source file.")
+    arg_parser.add_argument("path")
+    arg_parser.add_argument("--json", help="write the profile as JSON to this file, - for stdout")
+    arg_parser.add_argument("--folded", help="write collapsed stacks for flame graphs to this file, - for stdout")
+    arg_parser.add_argument("--top", type=int, default=None, help="only show this many rules in the table")
+    arg_parser.add_argument("--recover", action="store_true", help="keep parsing after syntax errors")
+    args = arg_parser.parse_args(argv)
+
+    source = pipeline.Pipeline.from_file(args.path)
+    # Parser.match prints while it runs, keep that out of the JSON and folded output
+    with contextlib.redirect_stdout(sys.stderr):
+        result, profile = profile_parse(source.parser_tokens(), args.recover)
+    if args.json:
+        write_output(args.json, json.dumps(profile.to_json(), indent=2) + "\n")
+    if args.folded:
+        write_output(args.folded, "".join(line + "\n" for line in profile.folded()))
+    if args.json != "-" and args.folded != "-":
+        print(profile.report(args.top))
+        if result is None:
+            print("Parsing stopped at a syntax error")
+
+def write_output(path, text):
+    if path == "-":
+        sys.stdout.write(text)
+    else:
+        with open(path, 'w') as file:
+            file.write(text)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,93 @@
 # runner.py
-from basic import lexer  # replace 'your_lexer_file_name' with the actual file name of your lexer code
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from basic import lexer, fast_lexer, stream_tokens, CHUNK_SIZE  # replace 'your_lexer_file_name' with the actual file name of your lexer code
+from tokenstream import stream_lexer
+import pipeline
+
+# Lexing engines, all produce the same tokens and errors
+LEXERS = {
+    "classic": lexer,        # character at a time
+    "fast": fast_lexer,      # one compiled master pattern
+    "compact": stream_lexer, # fast_lexer rules, tokens kept in a TokenStream
+}
 
 # Run function
-def run(fname, text):
-    Lexer = lexer(fname, text)
-    tokens, error = Lexer.make_tokens()
+# With recover=True the second value is the list of every error instead
+def run(fname, text, engine="classic", recover=False):
+    Lexer = LEXERS[engine](fname, text)
+    tokens, error = Lexer.make_tokens(recover)
     return tokens, error
+
+# Streaming: yields tokens while file_obj is read chunk by chunk,
+# raises basic.LexError on the first error
+def iter_tokens(file_obj, fname='<stream>', chunk_size=CHUNK_SIZE):
+    return stream_tokens(fname, file_obj, chunk_size)
+
+# Batch compilation: lex, parse and build the symbol table of one file.
+# Runs in a worker process, so it returns plain picklable data and turns
+# any failure into the file's error instead of raising.
+def compile_file(path):
+    start = time.perf_counter()
+    result = {"path": path, "tokens": 0, "token_types": [], "statements": 0,
+              "symbols": [], "error": None, "seconds": 0.0}
+    try:
+        source = pipeline.Pipeline.from_file(path)
+        if source.error:
+            result["error"] = source.error.as_string()
+        else:
+            result["tokens"] = len(source.tokens)
+            result["token_types"] = source.token_types()
+            result["statements"] = len(source.parse_tree()[1][1])
+            result["symbols"] = source.symbol_table().table
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+def run_many(paths, workers=None, chunksize=None):
+    """Compiles every file in paths on a pool of worker processes.
+
+    Returns (results, summary). results has one dict per path, in the
+    order of paths; a file that failed has its message in "error" and the
+    rest of the batch carries on. workers defaults to the number of CPUs,
+    workers=1 runs everything in this process.
+    """
+    paths = list(paths)
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    if workers == 1 or len(paths) < 2:
+        results = [compile_file(path) for path in paths]
+    else:
+        workers = min(workers, len(paths))
+        # Several small files per task keep the pool busy without much IPC
+        chunksize = chunksize or max(1, len(paths) // (workers * 4))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(compile_file, paths, chunksize=chunksize))
+    failed = [result["path"] for result in results if result["error"]]
+    summary = {
+        "files": len(results),
+        "succeeded": len(results) - len(failed),
+        "failed": len(failed),
+        "failed_paths": failed,
+        "tokens": sum(result["tokens"] for result in results),
+        "statements": sum(result["statements"] for result in results),
+        "workers": workers,
+        "seconds": time.perf_counter() - start,
+    }
+    return results, summary
+
+if __name__ == "__main__":
+    import argparse
+    arg_parser = argparse.ArgumentParser(description="Lex, parse and build symbol tables for many files.")
+    arg_parser.add_argument("paths", nargs="+")
+    arg_parser.add_argument("-j", "--workers", type=int, default=None, help="worker processes, default one per CPU")
+    args = arg_parser.parse_args()
+    results, summary = run_many(args.paths, args.workers)
+    for result in results:
+        status = result["error"] or f"{result['tokens']} tokens, {result['statements']} statements, {len(result['symbols'])} symbols"
+        print(f"{result['path']}: {status}")
+    print(f"{summary['succeeded']}/{summary['files']} files compiled, {summary['failed']} failed, "
+          f"{summary['tokens']} tokens in {summary['seconds']:.2f} s on {summary['workers']} workers")
@@ -0,0 +1,107 @@
+# tokenstream.py
+# Compact token storage: one TokenKind code and the start/end offsets of
+# the lexeme in the source per token, held in parallel array buffers. Values
+# are only built when a token is read, so a stream of millions of tokens costs
+# a few bytes per token instead of a Token object and a tuple each.
+from array import array
+
+from basic import (TokenKind, CATEGORIES, LEXEME_PATTERN, LexemeTable, NeedsExactScan,
+                   lexeme_kind, lexeme_value, scan_tokens, LineIndex, Position)
+
+class KindTable(dict):
+    """Maps each distinct lexeme to its kind code, classifying it once."""
+    def __missing__(self, lexeme):
+        if not lexeme[0].isascii():  # Needs the exact rules of check_keyword
+            raise NeedsExactScan(lexeme)
+        kind = lexeme_kind(lexeme)
+        self[lexeme] = kind
+        return kind
+
+class TokenStream:
+    def __init__(self, text):
+        self.text = text
+        self.kinds = array('B')
+        self.starts = array('I')
+        self.ends = array('I')
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def append(self, kind, start, end):
+        self.kinds.append(kind)
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def kind(self, i):
+        return TokenKind(self.kinds[i])
+
+    def category(self, i):
+        return CATEGORIES[self.kinds[i]]
+
+    def lexeme(self, i):
+        """Source text of token i, quotes included for strings."""
+        return self.text[self.starts[i]:self.ends[i]]
+
+    def value(self, i):
+        return lexeme_value(self.kinds[i], self.text[self.starts[i]:self.ends[i]])
+
+    def token(self, i):
+        """Token i in the tuple format of Token.show()."""
+        value = self.value(i)
+        if value:
+            return (CATEGORIES[self.kinds[i]], value)
+        return (CATEGORIES[self.kinds[i]],)
+
+    # Tuple view, so a stream can stand in for the list from make_tokens
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.token(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("token index out of range")
+        return self.token(i)
+
+    def __iter__(self):
+        for i in range(len(self.kinds)):
+            yield self.token(i)
+
+    def tuples(self):
+        return list(self)
+
+# Lexer producing a TokenStream, same interface as basic.lexer
+class stream_lexer:
+    def __init__(self, fname, text):
+        self.fname = fname
+        self.text = text
+
+    def make_tokens(self, recover=False):
+        text = self.text
+        stream = TokenStream(text)
+        kinds, starts, ends = stream.kinds, stream.starts, stream.ends
+        table = KindTable()
+        try:
+            for match in LEXEME_PATTERN.finditer(text):
+                lexeme = match.group(1)
+                if lexeme:
+                    kinds.append(table[lexeme])
+                    starts.append(match.start(1))
+                    ends.append(match.end(1))
+        except NeedsExactScan:
+            return self.scan_exact(recover)
+        return stream, [] if recover else None
+
+    def scan_exact(self, recover=False):
+        """Slow path for input LEXEME_PATTERN cannot classify, see fast_lexer."""
+        tokens = []
+        spans = []
+        errors = [] if recover else None
+        lines = LineIndex(self.text)
+        make_pos = lambda index: Position(index, self.fname, self.text, lines)
+        _, error = scan_tokens(self.text, 0, tokens, LexemeTable(), make_pos, spans=spans, errors=errors)
+        if error and not recover:
+            return [], error
+        stream = TokenStream(self.text)
+        for start, end in spans:
+            stream.append(lexeme_kind(self.text[start:end]), start, end)
+        return stream, errors